@@ -0,0 +1,51 @@
+"""Import-time benchmark: light submodules must import without the heavy dependencies.
+Exits with an error if a heavy module is pulled in, or an import is slower than --max-time"""
+
+import argparse
+import subprocess
+import sys
+
+heavy_modules = ['sympy', 'matplotlib', 'h5py', 'quaternion', 'tqdm', 'mpl_toolkits', 'scipy.interpolate']
+
+statements = {
+    'import my_pytools':                                  'import my_pytools',
+    'import my_pytools.my_numpy':                         'import my_pytools.my_numpy',
+    'from my_pytools.my_numpy.rotations import axis_angle': 'from my_pytools.my_numpy.rotations import axis_angle',
+    'my_pytools.my_numpy.rotations.axis_angle':           'import my_pytools; my_pytools.my_numpy.rotations.axis_angle',
+}
+
+code = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(','.join(name for name in {heavy} if name in sys.modules))
+"""
+
+def import_time(statement, repeat):
+    """return (best time, heavy modules loaded) of statement over repeat fresh interpreters"""
+    best = float('inf')
+    for i in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code.format(statement=statement, heavy=heavy_modules)],
+                                capture_output=True, text=True, check=True).stdout.split('\n')
+        best = min(best, float(output[0]))
+        loaded = [name for name in output[1].split(',') if name]
+    return best, loaded
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh interpreters per statement')
+    parser.add_argument('--max-time', type=float, default=None, help='fail if any import takes longer (seconds)')
+    args = parser.parse_args()
+
+    failed = False
+    for label, statement in statements.items():
+        elapsed, loaded = import_time(statement, args.repeat)
+        print(f'{label:55s} {elapsed*1e3:8.1f} ms   heavy modules: {", ".join(loaded) or "none"}')
+
+        if loaded or (args.max_time is not None and elapsed > args.max_time):
+            failed = True
+
+    if failed:
+        sys.exit('import-time regression')
@@ -0,0 +1,46 @@
+"""Interpolation benchmark: RegularGridInterpolator vs ndinterp (uniform-grid arithmetic lookup)
+vs an interpolation_plan reused for many datasets on the same query points"""
+
+import argparse
+import time
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+from my_pytools.my_numpy.interpolate import ndinterp, interpolation_plan
+
+def best_time(func, repeat):
+    """best wall time of func() over repeat runs"""
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shape', type=int, nargs=3, default=[64, 64, 64], help='grid size')
+    parser.add_argument('--points', type=int, default=10**6, help='number of query points')
+    parser.add_argument('--datasets', type=int, default=10, help='datasets interpolated onto the same points')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    axes = [np.linspace(0, 1, N) for N in args.shape]
+    datasets = rng.normal(size=(args.datasets,) + tuple(args.shape))
+    points = [rng.uniform(0, 1, args.points) for axis in axes]
+
+    def scipy_path():
+        return [RegularGridInterpolator(axes, data, bounds_error=False)(tuple(points)) for data in datasets]
+
+    def ndinterp_path():
+        return [ndinterp(data, *axes)(*points) for data in datasets]
+
+    def plan_path():
+        plan = interpolation_plan(axes, *points)
+        return [plan(data) for data in datasets]
+
+    reference = scipy_path()
+    for label, func in [('RegularGridInterpolator', scipy_path), ('ndinterp', ndinterp_path), ('interpolation_plan', plan_path)]:
+        error = max(np.max(np.abs(a - b)) for a, b in zip(func(), reference))
+        elapsed = best_time(func, args.repeat)
+        print(f'{label:25s} {elapsed:7.3f} s   ({args.datasets} datasets, {args.points} points)   max difference {error:.1e}')
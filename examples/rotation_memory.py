@@ -0,0 +1,58 @@
+"""Peak-memory benchmark: rotate_vector_field_3d on the full grid vs in slabs (max_memory).
+Each mode runs in a fresh interpreter; reports the peak RSS above the input data and checks the results are identical"""
+
+import argparse
+import subprocess
+import sys
+
+code = """
+import hashlib, resource, time
+import numpy as np
+from my_pytools.my_numpy.rotations import rotate_vector_field_3d, rotate_to
+
+N1, N2, N3 = {shape}
+r = np.linspace(1, 2, N1)
+theta = np.linspace(0, np.pi, N2)
+phi = np.linspace(0, 2*np.pi, N3)
+data = np.random.default_rng(0).normal(size=(3, N1, N2, N3))
+out = np.empty_like(data)
+rot = rotate_to([0,0,1], [1,1,1])
+
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if {max_memory} is None:
+    out[...] = rotate_vector_field_3d(rot, data, r, theta, phi)
+else:
+    rotate_vector_field_3d(rot, data, r, theta, phi, max_memory={max_memory}, out=out)
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+print((peak - baseline)/1024, elapsed, hashlib.sha1(out.tobytes()).hexdigest())
+"""
+
+def run(shape, max_memory):
+    """return (peak RSS above baseline in MB, time, result hash) of one rotation in a fresh interpreter"""
+    output = subprocess.run([sys.executable, '-c', code.format(shape=shape, max_memory=max_memory)],
+                            capture_output=True, text=True, check=True).stdout.split()
+    return float(output[0]), float(output[1]), output[2]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shape', type=int, nargs=3, default=[128, 64, 128], help='grid size N1 N2 N3')
+    parser.add_argument('--max-memory', type=float, default=64, help='slab memory budget (MB)')
+    args = parser.parse_args()
+
+    shape = tuple(args.shape)
+    data_size = 3*8*shape[0]*shape[1]*shape[2]/2**20
+    print(f'grid {shape}, field size {data_size:.0f} MB')
+
+    full = run(shape, None)
+    chunked = run(shape, int(args.max_memory*2**20))
+
+    for label, (peak, elapsed, _) in [('full grid', full), (f'slabs ({args.max_memory:.0f} MB)', chunked)]:
+        print(f'{label:20s} peak RSS +{peak:8.0f} MB   {elapsed:6.2f} s')
+    print(f'peak RSS reduction: {full[0]/max(chunked[0], 1):.1f}x')
+
+    if full[2] != chunked[2]:
+        sys.exit('results differ between the full-grid and slab rotations')
+    print('results identical')
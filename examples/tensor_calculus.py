@@ -0,0 +1,35 @@
+"""Curl benchmark: cartesian_operators.curl (precomputed stencil weights, in-place accumulation)
+vs the nine np.gradient calls of the Jacobian"""
+
+import argparse
+import time
+import numpy as np
+from my_pytools.my_numpy.tensor_calculus import cartesian_operators
+
+def gradient_curl(E, x, y, z):
+    """curl of E[3,Nx,Ny,Nz] from np.gradient"""
+    axes = (x, y, z)
+    J = [[np.gradient(E[k], axes[j], axis=j, edge_order=2) for k in range(3)] for j in range(3)]
+    return np.array([J[1][2] - J[2][1], J[2][0] - J[0][2], J[0][1] - J[1][0]])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shape', type=int, nargs=3, default=[200, 200, 200], help='grid size')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    axes = [np.linspace(0, 1, N) for N in args.shape]
+    E = np.random.default_rng(0).normal(size=(3,) + tuple(args.shape))
+    op = cartesian_operators(*axes)
+    out = np.empty_like(E)
+
+    for label, func in [('np.gradient', lambda: gradient_curl(E, *axes)),
+                        ('cartesian_operators', lambda: op.curl(E, out=out))]:
+        best = float('inf')
+        for i in range(args.repeat):
+            start = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - start)
+        print(f'{label:20s} {best:7.3f} s')
+
+    print(f'max difference {np.max(np.abs(out - gradient_curl(E, *axes))):.1e}')
@@ -1,6 +1,12 @@
-#main submodules
-from . import my_numpy
-from . import my_matplotlib
-from . import my_h5py
-from . import my_vpython
-from . import helpers
+#main submodules (imported lazily, on first attribute access)
+import importlib
+
+_submodules = ['my_numpy', 'my_matplotlib', 'my_h5py', 'my_vpython', 'helpers']
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules))
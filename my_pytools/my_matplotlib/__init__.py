@@ -1,7 +1,15 @@
-from . import style
-from . import plots
+#submodules (imported lazily, on first attribute access)
+import importlib
+
+# colors is imported eagerly: it installs the package palette in rcParams and registers its colormaps
 from . import colors
-from . import layout
-from . import animation
-from . import geometry
-from . import patches
+
+_submodules = ['style', 'plots', 'colors', 'layout', 'animation', 'geometry', 'patches']
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules))
@@ -1,8 +1,13 @@
-from . import interpolate 
-from . import integrate 
-from . import rotations
-from . import indices
-from . import coordinate_transforms
-from . import special
-from . import optimize
-from . import array
+#submodules (imported lazily, on first attribute access)
+import importlib
+
+_submodules = ['interpolate', 'integrate', 'rotations', 'indices', 'coordinate_transforms',
+               'special', 'optimize', 'array', 'coefficient_store', 'grids', 'tensor_calculus']
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules))
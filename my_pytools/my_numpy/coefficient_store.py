@@ -0,0 +1,154 @@
+"""
+Persistent, size-bounded storage of the VSH translation coefficients a(m,n,u,v,p) and b(m,n,u,v,p)
+"""
+
+import os
+from collections import OrderedDict
+import numpy as np
+import h5py
+from my_pytools.my_h5py import write_over
+from .special import a_func, mode_index, _gaunt_block, _b_from_a
+
+class coefficient_store:
+    def __init__(self, filepath, nmax, method='gaunt', max_memory=2**28, read_only=False):
+        """store of translation coefficients backed by an hdf5 file, loaded lazily in blocks
+           of constant n and kept in memory with least-recently-used eviction
+
+                filepath      path to hdf5 file
+                nmax          maximum order n,v (p runs from 0 to 2*nmax)
+                method        'gaunt' (wigner 3j closed form) or 'quad' (numerical integration)
+                max_memory    in-memory budget in bytes for loaded blocks
+                read_only     If True, never write to the file (for worker processes sharing it)
+
+           Worker processes on the same machine can share one file: call precompute() once,
+           then open the store in every worker with read_only=True                          """
+
+        if method not in ('gaunt', 'quad'):
+            raise ValueError(f"method must be 'gaunt' or 'quad' (got '{method}')")
+
+        self.filepath = filepath
+        self.nmax = nmax
+        self.method = method
+        self.max_memory = max_memory
+        self.read_only = read_only
+        self.blocks = OrderedDict()
+
+        if os.path.exists(filepath):
+            with h5py.File(filepath, 'r') as f:
+                if method in f and f[method].attrs['nmax'] != nmax:
+                    raise ValueError(f"'{filepath}' stores '{method}' coefficients for nmax = {f[method].attrs['nmax']}, not {nmax}")
+
+    def a(self, m, n, u, v, p):
+        """a function that appears in the VSH translation coefficients"""
+        if not 0 <= v <= self.nmax:
+            raise ValueError(f"v must be between 0 and nmax = {self.nmax} (got {v})")
+        if np.abs(m) > n or np.abs(u) > v or not 0 <= p <= 2*self.nmax:
+            return 0
+        return self.block(n)[0][m+n,v,u,p]
+
+    def b(self, m, n, u, v, p):
+        """b function that appears in the VSH translation coefficients"""
+        if not 0 <= v <= self.nmax:
+            raise ValueError(f"v must be between 0 and nmax = {self.nmax} (got {v})")
+        if np.abs(m) > n or np.abs(u) > v or not 0 <= p <= 2*self.nmax:
+            return 0
+        return self.block(n)[1][m+n,v,u,p]
+
+    def block(self, n):
+        """return the (a,b) block of order n, each indexed as [m+n,v,u,p] with negative u wrapping around"""
+        if n in self.blocks:
+            self.blocks.move_to_end(n)
+            return self.blocks[n]
+
+        if not 0 <= n <= self.nmax:
+            raise ValueError(f"n must be between 0 and nmax = {self.nmax} (got {n})")
+
+        block = self._load(n)
+        if block is None:
+            block = self._compute(n)
+            if not self.read_only:
+                self._write(n, block)
+
+        self.blocks[n] = block
+        self._evict()
+        return block
+
+    def tables(self, lmax=None):
+        """return (a,b) in the packed layout of gaunt_tables, a[mode_index(n,m), mode_index(v,u), p]"""
+        if lmax is None:
+            lmax = self.nmax
+        if lmax > self.nmax:
+            raise ValueError(f"lmax must be <= nmax = {self.nmax} (got {lmax})")
+
+        size = 2*lmax + 1
+        nmodes = lmax*(lmax+2)
+        a = np.zeros((nmodes, nmodes, size))
+        b = np.zeros_like(a)
+        for n in range(1, lmax+1):
+            a_block, b_block = self.block(n)
+            for v in range(1, lmax+1):
+                m, u = np.meshgrid(np.arange(-n,n+1), np.arange(-v,v+1), indexing='ij')
+                i, j = mode_index(n,m), mode_index(v,u)
+                a[i,j] = a_block[m+n,v,u,:size]
+                b[i,j] = b_block[m+n,v,u,:size]
+
+        return a, b
+
+    def precompute(self):
+        """compute and write every block to the file"""
+        for n in range(self.nmax+1):
+            self.block(n)
+
+    def clear(self):
+        """drop all blocks held in memory (the file is unchanged)"""
+        self.blocks.clear()
+
+    def memory(self):
+        """return the memory (in bytes) used by the loaded blocks"""
+        return sum(a.nbytes + b.nbytes for a,b in self.blocks.values())
+
+    def _evict(self):
+        """drop least-recently-used blocks until the memory budget is met (keeps the newest block)"""
+        while len(self.blocks) > 1 and self.memory() > self.max_memory:
+            self.blocks.popitem(last=False)
+
+    def _load(self, n):
+        """load block n from file, or return None if it has not been stored"""
+        if not os.path.exists(self.filepath):
+            return None
+
+        with h5py.File(self.filepath, 'r') as f:
+            if f'{self.method}/a/{n}' not in f:
+                return None
+            return f[f'{self.method}/a/{n}'][...], f[f'{self.method}/b/{n}'][...]
+
+    def _write(self, n, block):
+        """write block n to file"""
+        with h5py.File(self.filepath, 'a') as f:
+            group = f.require_group(self.method)
+            group.attrs['nmax'] = self.nmax
+            write_over(group, f'a/{n}', block[0])
+            write_over(group, f'b/{n}', block[1])
+
+    def _compute(self, n):
+        """compute block n with the store's method"""
+        size = 2*self.nmax + 1
+        a_block = np.zeros((2*n+1, self.nmax+1, size, size))
+        b_block = np.zeros_like(a_block)
+
+        for v in range(self.nmax+1):
+            if self.method == 'gaunt':
+                a_nv = _gaunt_block(n, v, size)
+            else:
+                a_nv = np.zeros((size, 2*n+1, 2*v+1))
+                for m in range(-n, n+1):
+                    for u in range(-v, v+1):
+                        for p in range(size):
+                            a_nv[p,m+n,u+v] = a_func.__wrapped__(m, n, u, v, p)
+            b_nv = _b_from_a(a_nv, n, v)
+
+            u = np.arange(-v, v+1)
+            a_block[:,v,u] = np.moveaxis(a_nv, 0, -1)
+            b_block[:,v,u] = np.moveaxis(b_nv, 0, -1)
+
+        return a_block, b_block
@@ -1,13 +1,5 @@
 import numpy as np
-import matplotlib.pyplot as plt
-
-def f(x,y,z):
-    return np.array([x,y,z])
-
-
-r = np.linspace(0,1,10)
-theta = np.linspace(0,np.pi,10)
-phi = np.linspace(0,2*np.pi,10)
+from .grids import spherical_grid
 
 def sph_basis_vectors(theta, phi):
     rhat = np.array([np.sin(theta)*np.cos(phi), np.sin(theta)*np.sin(phi), np.cos(theta)])
@@ -17,9 +9,29 @@ def sph_basis_vectors(theta, phi):
     return rhat, theta_hat, phi_hat
 
 def cart_basis_vectors(theta, phi):
-    pass
+    """Cartesian unit vectors xhat, yhat, zhat in spherical components (r, theta, phi)"""
+    xhat = np.array([np.sin(theta)*np.cos(phi), np.cos(theta)*np.cos(phi), -1*np.sin(phi)])
+    yhat = np.array([np.sin(theta)*np.sin(phi), np.cos(theta)*np.sin(phi), np.cos(phi)])
+    zhat = np.array([np.cos(theta), -1*np.sin(theta), 0*theta])
+
+    return xhat, yhat, zhat
+
+def cyl_basis_vectors(phi):
+    """cylindrical unit vectors rho_hat, phi_hat, zhat in Cartesian components"""
+    rho_hat = np.array([np.cos(phi), np.sin(phi), 0*phi])
+    phi_hat = np.array([-1*np.sin(phi), np.cos(phi), 0*phi])
+    zhat = np.array([0*phi, 0*phi, 0*phi + 1])
+
+    return rho_hat, phi_hat, zhat
+
+def sph_to_cart(r, theta=None, phi=None):
+    """Cartesian coordinates of (r,theta,phi); r may be a spherical_grid (cached unit vectors, scaled by its r)"""
+    if isinstance(r, spherical_grid):
+        grid = r
+        if grid.r is None:
+            return grid.rhat
+        return grid.r[:,np.newaxis,np.newaxis]*grid.rhat[:,np.newaxis]
 
-def sph_to_cart(r, theta, phi):
     x = r*np.sin(theta)*np.cos(phi)
     y = r*np.sin(theta)*np.sin(phi)
     z = r*np.cos(theta)
@@ -34,6 +46,31 @@ def cart_to_sph(x,y,z):
 
     return np.array([r,theta,phi])
 
+def cyl_to_cart(rho, phi, z):
+    x = rho*np.cos(phi)
+    y = rho*np.sin(phi)
+
+    return np.array([x,y,z])
+
+def cart_to_cyl(x,y,z):
+    rho = (x**2 + y**2)**.5
+    phi = np.arctan2(y,x)
+    phi[phi<0] += 2*np.pi
+
+    return np.array([rho,phi,z])
+
+def sph_to_cyl(r, theta, phi):
+    rho = r*np.sin(theta)
+    z = r*np.cos(theta)
+
+    return np.array([rho,phi,z])
+
+def cyl_to_sph(rho, phi, z):
+    r = (rho**2 + z**2)**.5
+    theta = np.arctan2(rho, z)
+
+    return np.array([r,theta,phi])
+
 def cart_to_sph_domain(func):
 
     def g(r, theta, phi, *args, **kwargs):
@@ -51,7 +88,12 @@ def sph_to_cart_domain(func):
     return g
 
 def cart_to_sph_range(func):
-    pass
+    """func(r,theta,phi) returns Cartesian components; return g(r,theta,phi) with spherical components"""
+    def g(*args, **kwargs):
+        func_ret = func(*args, **kwargs)
+        xhat, yhat, zhat = cart_basis_vectors(args[1], args[2])
+        return xhat*func_ret[0] + yhat*func_ret[1] + zhat*func_ret[2]
+    return g
 
 def sph_to_cart_range(func):
     def g(*args, **kwargs):
@@ -60,7 +102,86 @@ def sph_to_cart_range(func):
         return rhat*func_ret[0] + theta_hat*func_ret[1] + phi_hat*func_ret[2]
     return g
 
+systems = ('cart', 'sph', 'cyl')
+
+class vector_transform:
+    def __init__(self, system, c1, c2, c3, dtype=np.float64):
+        """convert vector fields on a fixed grid between Cartesian, spherical and cylindrical components;
+           the basis matrices are computed once per pair of systems and each conversion is a single einsum
+
+                system          coordinate system of the grid: 'cart' (x,y,z), 'sph' (r,theta,phi) or 'cyl' (rho,phi,z)
+                c1,c2,c3        1-d axes of the grid
+                dtype           dtype of the cached matrices and of the result (e.g. np.float32; the
+                                complex counterpart for complex fields)                            """
+
+        if system not in systems:
+            raise ValueError(f"system must be one of {systems} (got '{system}')")
+
+        self.system = system
+        self.dtype = dtype
+        self.shape = (len(c1), len(c2), len(c3))
+        self.matrices = {}
+
+        # sparse meshes: bases only vary along the axes they depend on (e.g. not along r)
+        c1, c2, c3 = np.meshgrid(c1, c2, c3, indexing='ij', sparse=True)
+        if system == 'cart':
+            x, y, z = c1, c2, c3
+            theta, phi = np.arctan2(np.sqrt(x**2 + y**2), z), np.arctan2(y, x)
+        elif system == 'sph':
+            theta, phi = c2, c3
+        else:
+            theta, phi = np.arctan2(c1, c3), c2
+
+        theta, phi = np.broadcast_arrays(theta, phi)
+        rhat, theta_hat, phi_hat = sph_basis_vectors(theta, phi)
+        rho_hat, _, zhat = cyl_basis_vectors(phi)
+
+        # unit vectors of each system in Cartesian components, basis[system][i,a]
+        self.basis = dict(cart = np.eye(3).reshape((3,3,1,1,1)),
+                          sph = np.array([rhat, theta_hat, phi_hat]),
+                          cyl = np.array([rho_hat, phi_hat, zhat]))
+
+    def matrix(self, source, target):
+        """cached matrix M[i,j,...] = e_target[i].e_source[j] that converts source components to target components"""
+        for name in (source, target):
+            if name not in systems:
+                raise ValueError(f"system must be one of {systems} (got '{name}')")
+
+        if (source, target) not in self.matrices:
+            M = np.einsum('ia...,ja...->ij...', self.basis[target], self.basis[source])
+            self.matrices[(source, target)] = M.astype(self.dtype)
+        return self.matrices[(source, target)]
+
+    def __call__(self, field, source, target, out=None):
+        """convert vector fields from source to target components
+
+                field[...,3,N1,N2,N3]       vector fields (any number of leading dimensions)
+                source, target              'cart', 'sph' or 'cyl'
+                out[...,3,N1,N2,N3]         (optional) buffer for the result (any float or complex dtype; the
+                                            field is cast to it with casting='same_kind')
+
+           Returns the converted fields, of the transform's dtype (its complex counterpart for complex fields)
+           unless out is given"""
+        field = np.asarray(field)
+        if field.shape[-4:] != (3,) + self.shape:
+            raise ValueError(f"field of shape {field.shape} does not match the grid {(3,) + self.shape}")
+
+        if out is None:
+            dtype = np.result_type(self.dtype, np.complex64) if np.iscomplexobj(field) else self.dtype
+            out = np.empty(field.shape, dtype=dtype)
+        M = self.matrix(source, target)
+        np.einsum('ij...,bj...->bi...', M, field.reshape((-1,) + field.shape[-4:]),
+                  out=out.reshape((-1,) + field.shape[-4:]), casting='same_kind')
+        return out
+
 if __name__ == "__main__":
+    def f(x,y,z):
+        return np.array([x,y,z])
+
+    r = np.linspace(0,1,10)
+    theta = np.linspace(0,np.pi,10)
+    phi = np.linspace(0,2*np.pi,10)
+
     g = cart_to_sph_domain(f)
     g = sph_to_cart_range(f)
 
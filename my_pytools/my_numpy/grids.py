@@ -0,0 +1,115 @@
+"""
+Grids that own their 1d axes and lazily compute (and cache) the tables derived from them
+"""
+
+import numpy as np
+from functools import cached_property
+
+class spherical_grid:
+    def __init__(self, theta, phi, r=None):
+        """tensor-product grid on the sphere (or a spherical shell); meshes, trig tables, Legendre tables,
+           basis vectors and quadrature weights are computed on first use and cached
+
+                theta[N1]       values of theta (from 0 to pi)
+                phi[N2]         values of phi (from 0 to 2*pi)
+                r[N0]           (optional) values of r, for 3d fields
+
+           Accepted in place of raw axes by sphere_integrate, rotate_discrete_data, rotate_vector_field_3d,
+           sph_to_cart and VSH_expansion                                                              """
+        self.theta = np.asarray(theta, dtype=float)
+        self.phi = np.asarray(phi, dtype=float)
+        self.r = None if r is None else np.asarray(r, dtype=float)
+        self._legendre = {}
+
+    @property
+    def shape(self):
+        """shape of the angular grid (N1,N2)"""
+        return (len(self.theta), len(self.phi))
+
+    @cached_property
+    def sin_theta(self):
+        return np.sin(self.theta)
+
+    @cached_property
+    def cos_theta(self):
+        return np.cos(self.theta)
+
+    @cached_property
+    def sin_phi(self):
+        return np.sin(self.phi)
+
+    @cached_property
+    def cos_phi(self):
+        return np.cos(self.phi)
+
+    @cached_property
+    def mesh(self):
+        """THETA[N1,N2], PHI[N1,N2] (indexing='ij')"""
+        return np.meshgrid(self.theta, self.phi, indexing='ij')
+
+    @cached_property
+    def sparse_mesh(self):
+        """theta[N1,1], phi[1,N2], broadcastable against each other"""
+        return self.theta[:,np.newaxis], self.phi[np.newaxis,:]
+
+    @cached_property
+    def rhat(self):
+        """radial unit vectors in Cartesian components, [3,N1,N2] (the points of the unit sphere)"""
+        return np.array([np.outer(self.sin_theta, self.cos_phi),
+                         np.outer(self.sin_theta, self.sin_phi),
+                         np.outer(self.cos_theta, np.ones_like(self.phi))])
+
+    @cached_property
+    def sph_basis(self):
+        """rhat, theta_hat, phi_hat in Cartesian components, [3,3,N1,N2]"""
+        theta_hat = np.array([np.outer(self.cos_theta, self.cos_phi),
+                              np.outer(self.cos_theta, self.sin_phi),
+                              np.outer(-self.sin_theta, np.ones_like(self.phi))])
+        phi_hat = np.array([np.outer(np.ones_like(self.theta), -self.sin_phi),
+                            np.outer(np.ones_like(self.theta), self.cos_phi),
+                            np.zeros(self.shape)])
+        return np.array([self.rhat, theta_hat, phi_hat])
+
+    @cached_property
+    def cart_basis(self):
+        """xhat, yhat, zhat in spherical components, [3,3,N1,N2] (the transpose of sph_basis)"""
+        return np.swapaxes(self.sph_basis, 0, 1)
+
+    def legendre(self, lmax, deriv=False):
+        """associated_legendre_table(lmax, cos(theta)), [lmax+1,2*lmax+1,N1] (and its derivative)
+           Tables of a lower lmax are sliced from a cached larger one"""
+        from .special import associated_legendre_table
+
+        cached = [l for l in self._legendre if l >= lmax and (self._legendre[l][1] is not None or not deriv)]
+        if cached:
+            P, dP = self._legendre[min(cached)]
+            if P.shape[0] == lmax+1:
+                return (P, dP) if deriv else P
+        else:
+            P, dP = associated_legendre_table(lmax, self.cos_theta, deriv=True) if deriv else \
+                    (associated_legendre_table(lmax, self.cos_theta), None)
+            self._legendre[lmax] = P, dP
+            return (P, dP) if deriv else P
+
+        # negative m wraps around, so keep m in [-lmax, lmax] of the larger table
+        m = np.arange(-lmax, lmax+1) % P.shape[1]
+        m = np.roll(m, -lmax)
+        P = P[:lmax+1, m]
+        if deriv:
+            return P, dP[:lmax+1, m]
+        return P
+
+    @cached_property
+    def weights(self):
+        """Simpson quadrature weights [N1,N2] over the grid, including the sin(theta) Jacobian"""
+        return self.integrator.weights
+
+    @cached_property
+    def integrator(self):
+        """sphere_integrator on the grid"""
+        from .integrate import sphere_integrator
+        return sphere_integrator(self.theta, self.phi)
+
+    def integrate(self, values):
+        """integrate values[...,N1,N2] over the grid"""
+        return self.integrator(values)
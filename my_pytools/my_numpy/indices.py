@@ -1,11 +1,36 @@
 """Functions related to index notation, einsum, and tensors"""
 import numpy as np
+from functools import lru_cache
 
 # Levi-Civita symbol
+@lru_cache(maxsize=None)
 def levi_civita():
-    """return the levi-civita symbol"""
+    """return the levi-civita symbol (cached, read-only)"""
 
     eijk = np.zeros((3, 3, 3))
     eijk[0, 1, 2] = eijk[1, 2, 0] = eijk[2, 0, 1] = 1
     eijk[0, 2, 1] = eijk[2, 1, 0] = eijk[1, 0, 2] = -1
+    eijk.flags.writeable = False
     return eijk
+
+@lru_cache(maxsize=None)
+def einsum_path(subscripts, *shapes):
+    """cached optimal contraction path of np.einsum for operands of the given shapes"""
+    operands = [np.broadcast_to(0., shape) for shape in shapes]
+    return np.einsum_path(subscripts, *operands, optimize='optimal')[0]
+
+def einsum(subscripts, *operands, out=None):
+    """np.einsum with the contraction path computed once per (subscripts, shapes)"""
+    operands = [np.asarray(op) for op in operands]
+    path = einsum_path(subscripts, *(op.shape for op in operands))
+    return np.einsum(subscripts, *operands, optimize=path, out=out)
+
+def cross(a, b, axis=0, out=None):
+    """batched cross product of vector fields a and b (broadcastable), with components along axis"""
+    a = np.moveaxis(np.asarray(a), axis, 0)
+    b = np.moveaxis(np.asarray(b), axis, 0)
+    if out is not None:
+        out = np.moveaxis(out, axis, 0)
+
+    result = einsum('ijk,j...,k...->i...', levi_civita(), a, b, out=out)
+    return np.moveaxis(result, 0, axis)
@@ -1,61 +1,255 @@
 import numpy as np
-from scipy.integrate import simps
-from .rotations import rotate_discrete_data
+from functools import lru_cache
+try:
+    from scipy.integrate import simpson
+except ImportError:
+    from scipy.integrate import simps as simpson
+from .rotations import rotate_discrete_data, rotate_to, harmonic_rotator
+from .grids import spherical_grid
 
-def simps_2d(xd,yd,fd):
-    """1d simpsons rule extended to 2d"""
-    if np.iscomplexobj(fd):
-        return simps_2d(xd, yd, fd.real) + 1j*simps_2d(xd, yd, fd.imag)
+def simps_nd(fd, *axes):
+    """1d simpsons rule extended to N dimensions, applied axis by axis (last first)
+            fd[N1,N2,...]       data to integrate (real or complex)
+            *axes               values of each variable, x[N1], y[N2], ...; None (or omitted trailing axes)
+                                leaves that dimension unintegrated
+
+       Returns the integral, with the shape of the unintegrated dimensions
+
+       An h5py dataset is integrated out of core (see simps_dataset)           """
+    if not isinstance(fd, np.ndarray) and hasattr(fd, 'chunks'):
+        return simps_dataset(fd, *axes)
+
+    fd = np.asarray(fd)
+    if len(axes) > fd.ndim:
+        raise ValueError(f"got {len(axes)} axes for {fd.ndim}-dimensional data")
 
-    xData = np.zeros(len(xd))
-    for i,x in enumerate(xd):
-        xData[i] = simps(fd[i,:], yd)
+    for axis in reversed(range(len(axes))):
+        if axes[axis] is not None:
+            fd = simpson(fd, x=axes[axis], axis=axis)
 
-    return simps(xData, xd)
+    return fd
+
+def simps_dataset(dataset, *axes, max_memory=2**28):
+    """simps_nd for data too large for memory (e.g. an h5py dataset): the data is read in slabs along the
+       first axis (aligned to the dataset's chunks), the inner axes are integrated per slab, and the first
+       axis is accumulated with its Simpson weights
+            dataset[N1,N2,...]  data to integrate (anything sliceable with a shape and dtype)
+            *axes               as in simps_nd
+            max_memory          memory budget in bytes for one slab                         """
+    if len(axes) > len(dataset.shape):
+        raise ValueError(f"got {len(axes)} axes for {len(dataset.shape)}-dimensional data")
+    axes = list(axes) + [None]*(len(dataset.shape) - len(axes))
+
+    N1 = dataset.shape[0]
+    bytes_per_row = np.dtype(dataset.dtype).itemsize*int(np.prod(dataset.shape[1:]))
+    rows = int(np.clip(max_memory//max(bytes_per_row, 1), 1, N1))
+    chunks = getattr(dataset, 'chunks', None)
+    if chunks is not None and rows >= chunks[0]:
+        rows -= rows % chunks[0]
+
+    weights = None if axes[0] is None else simpson_weights(axes[0])
+    result = 0 if weights is not None else []
+    for start in range(0, N1, rows):
+        slab = simps_nd(np.asarray(dataset[start:start+rows]), None, *axes[1:])
+        if weights is None:
+            result.append(slab)
+        else:
+            result = result + np.tensordot(weights[start:start+rows], slab, axes=1)
+
+    return np.concatenate(result) if weights is None else result
+
+def simps_2d(xd,yd,fd):
+    """1d simpsons rule extended to 2d"""
+    return simps_nd(fd, xd, yd)
 
 def simps_3d(xd,yd,zd,fd):
     """1d simpsons rule extended to 3d"""
-    xyData = np.zeros((len(xd), len(yd)))
-    for i,x in enumerate(xd):
-        for j,y in enumerate(yd):
-            xyData[i,j] = simps(fd[i,j,:], zd)
-
-    return simps_2d(xd,yd, xyData)
+    return simps_nd(fd, xd, yd, zd)
 
 def simps_4d(xd,yd,zd,wd,fd):
     """1d simpsons rule extended to 4d"""
-    xyzData = np.zeros((len(xd), len(yd), len(zd)))
-    for i,x in enumerate(xd):
-        for j,y in enumerate(yd):
-            for j,k in enumerate(zd):
-                xyzData[i,j,k] = simps(fd[i,j,k,:], wd)
+    return simps_nd(fd, xd, yd, zd, wd)
+
+class grid_integrator:
+    def __init__(self, *axes):
+        """Simpson integration on a fixed grid: the weights are computed once, and each integral is a single tensordot
+
+                *axes       values of each variable, x[N1], y[N2], ...                                          """
+        self.axes = [np.asarray(x) for x in axes]
+        self.axis_weights = [simpson_weights(x) for x in self.axes]
+        self.weights = self.axis_weights[0]
+        for w in self.axis_weights[1:]:
+            self.weights = np.multiply.outer(self.weights, w)
+
+    def __call__(self, fd):
+        """integrate fd[...,N1,N2,...], with any number of leading batch dimensions"""
+        return np.tensordot(fd, self.weights, axes=self.weights.ndim)
+
+class sphere_integrator(grid_integrator):
+    def __init__(self, theta, phi):
+        """Simpson integration over (a portion of) a sphere on a fixed grid, including the sin(theta) Jacobian
+
+                theta[N1]       values of theta
+                phi[N2]         values of phi                                           """
+        super().__init__(theta, phi)
+        self.axis_weights[0] = self.axis_weights[0]*np.sin(self.axes[0])
+        self.weights = np.multiply.outer(*self.axis_weights)
+
+def simpson_weights(x):
+    """weights w[N] of Simpson's rule on x[N], such that simpson(f, x=x) = w.f"""
+    x = np.asarray(x)
+    return simpson(np.eye(len(x)), x=x, axis=-1)
 
-    return simps_3d(xd,yd,zd, xyzData)
+@lru_cache(maxsize=None)
+def clenshaw_curtis_weights(N):
+    """cached Clenshaw-Curtis weights on the nodes cos(k pi/(N-1)), k = 0..N-1 (read-only array); exact for
+       polynomials of degree N-1, e.g. integrals over cos(theta) sampled at equally spaced theta from 0 to pi"""
+    n = N - 1
+    k = np.arange(N)
+    j = np.arange(1, n//2 + 1)
+    b = np.where(2*j == n, 1, 2)
+    w = 1 - np.sum(b/(4*j**2 - 1)*np.cos(2*np.pi*np.outer(k, j)/n), axis=1)
+    w *= np.where((k == 0) | (k == n), 1, 2)/n
+    w.flags.writeable = False
+    return w
 
+lebedev_orders = [3, 5, 7, 9, 11, 13, 15, 17, 19, 21, 23, 25, 27, 29, 31, 35, 41, 47, 53,
+                  59, 65, 71, 77, 83, 89, 95, 101, 107, 113, 119, 125, 131]
 
-def sphere_integrate(func, N, theta_min, theta_max, phi_min = 0, phi_max = 2*np.pi, axis_init=None, axis_final=None):
+@lru_cache(maxsize=None)
+def gauss_legendre_nodes(N):
+    """cached Gauss-Legendre nodes and weights on [-1,1] (read-only arrays)"""
+    x, w = np.polynomial.legendre.leggauss(N)
+    x.flags.writeable = False
+    w.flags.writeable = False
+    return x, w
+
+@lru_cache(maxsize=None)
+def lebedev_nodes(order):
+    """cached Lebedev nodes (theta[M], phi[M]) and weights[M] (summing to 4*pi) of a given order (read-only arrays);
+       requires SciPy >= 1.15"""
+    try:
+        from scipy.integrate import lebedev_rule
+    except ImportError:
+        import scipy
+        raise ImportError(f"Lebedev quadrature requires SciPy >= 1.15 (scipy.integrate.lebedev_rule); found SciPy {scipy.__version__}") from None
+
+    if order not in lebedev_orders:
+        raise ValueError(f"Lebedev order must be one of {lebedev_orders} (got {order})")
+
+    (x, y, z), w = lebedev_rule(order)
+    theta = np.arccos(np.clip(z, -1, 1))
+    phi = np.arctan2(y, x)
+    phi[phi < 0] += 2*np.pi
+
+    for arr in (theta, phi, w):
+        arr.flags.writeable = False
+    return theta, phi, w
+
+def sphere_quadrature(N, theta_min=0, theta_max=np.pi, phi_min=0, phi_max=2*np.pi, method='gauss'):
+    """nodes and weights of a quadrature rule over an angular portion of a sphere,
+       such that integral of f(theta,phi) sin(theta) = sum(weights*f(theta,phi))
+
+            N                   Number of pts per dimension ('gauss') or order of the rule ('lebedev')
+            theta_min...        angular limits (Lebedev grids cover the full sphere only)
+            method              'gauss' (Gauss-Legendre in cos(theta) x trapezoid in phi, or Gauss-Legendre
+                                for a partial phi range) or 'lebedev'
+
+       Returns theta, phi, weights ('gauss': [N,N] meshes, 'lebedev': [M] nodes)"""
+
+    if method == 'gauss':
+        x, w = gauss_legendre_nodes(N)
+        a, b = np.cos(theta_max), np.cos(theta_min)
+        theta = np.arccos((b-a)/2*x + (b+a)/2)
+        w_theta = (b-a)/2*w
+
+        # the trapezoid rule is spectrally accurate over a full period only; use Gauss-Legendre otherwise
+        if np.isclose(phi_max - phi_min, 2*np.pi):
+            phi = np.linspace(phi_min, phi_max, N, endpoint=False)
+            w_phi = np.full(N, (phi_max - phi_min)/N)
+        else:
+            phi = (phi_max - phi_min)/2*x + (phi_max + phi_min)/2
+            w_phi = (phi_max - phi_min)/2*w
+
+        theta, phi = np.meshgrid(theta, phi, indexing='ij')
+        return theta, phi, np.outer(w_theta, w_phi)
+
+    elif method == 'lebedev':
+        if not (np.isclose(theta_min, 0) and np.isclose(theta_max, np.pi)
+                    and np.isclose(phi_max - phi_min, 2*np.pi)):
+            raise ValueError("Lebedev quadrature requires the full sphere (theta from 0 to pi, phi over 2*pi)")
+
+        theta, phi, w = lebedev_nodes(N)
+        phi = np.mod(phi - phi_min, 2*np.pi) + phi_min
+        return theta, phi, w
+
+    raise ValueError(f"method must be 'gauss' or 'lebedev' (got '{method}')")
+
+def _lower_order(N, method):
+    """the rule order compared against N in the error estimate"""
+    if method == 'lebedev':
+        if N not in lebedev_orders or N == lebedev_orders[0]:
+            raise ValueError(f"no Lebedev order below {N} to estimate the error")
+        return lebedev_orders[lebedev_orders.index(N) - 1]
+
+    return max(N//2 | 1, 3) if method == 'simpson' else max(N//2, 1)
+
+def sphere_integrate(func, N, theta_min = 0, theta_max = np.pi, phi_min = 0, phi_max = 2*np.pi, axis_init=None, axis_final=None,
+                     method='simpson', error=False, rotation='interpolate'):
     """Integrate over an angular portion of a sphere (discrete integration)
 
-            func(theta,phi)     function to inegrate
-            N                   Number of pts used in discretization
+            func(theta,phi)     function to inegrate (or a harmonic_rotator, which is rotated without re-sampling)
+            N                   Number of pts used in discretization (order of the rule for 'lebedev'), or a
+                                spherical_grid, integrated with its cached Simpson weights over its own domain
             theta_min           minimum theta
             theta_max           maximum theta
             phi_min             minimum phi
             phi_max             maximum phi
             axis_init           initial z-axis of data
-            axis_final          final z-axis of data (if rotation of z-axis is desired)         """
+            axis_final          final z-axis of data (if rotation of z-axis is desired)
+            method              'simpson' (uniform NxN mesh), 'gauss' (Gauss-Legendre in cos(theta) x trapezoid
+                                in phi) or 'lebedev' (full sphere only)
+            error               If True, return (integral, error estimate), where the estimate is the difference
+                                to the same rule at a lower order
+            rotation            rotation method of rotate_discrete_data ('interpolate' or 'harmonic')              """
+
+    if error and isinstance(N, spherical_grid):
+        raise ValueError("error estimates need a rule order N, not a spherical_grid")
+    if method != 'simpson' and isinstance(N, spherical_grid):
+        raise ValueError(f"a spherical_grid is integrated with its own Simpson weights, not method = '{method}'")
+    if error:
+        args = (theta_min, theta_max, phi_min, phi_max, axis_init, axis_final, method, False, rotation)
+        I = sphere_integrate(func, N, *args)
+        I_lower = sphere_integrate(func, _lower_order(N, method), *args)
+        return I, np.abs(I - I_lower)
 
-    theta_int = np.linspace(theta_min, theta_max, N)
-    phi_int = np.linspace(phi_min, phi_max, N)
+    if isinstance(N, spherical_grid):
+        grid = N
+        if axis_init is not None and axis_final is not None and isinstance(func, harmonic_rotator):
+            R = func.rotate(rotate_to(axis_init, axis_final))
+        elif axis_init is not None and axis_final is not None:
+            R = rotate_discrete_data(func, grid, None, axis_init, axis_final, method=rotation)
+        else:
+            R = func
+        return grid.integrate(R(*grid.mesh))
 
     theta = np.linspace(0, np.pi, N)
     phi = np.linspace(0, 2*np.pi, N)
 
-    if axis_init != None and axis_final != None:
-        R = rotate_discrete_data(func, theta, phi, axis_init, axis_final)
+    if axis_init is not None and axis_final is not None and isinstance(func, harmonic_rotator):
+        R = func.rotate(rotate_to(axis_init, axis_final))
+    elif axis_init is not None and axis_final is not None:
+        R = rotate_discrete_data(func, theta, phi, axis_init, axis_final, method=rotation)
     else:
         R = func
 
-    # sigma_data = R(*np.meshgrid(theta, phi, indexing='ij'))
-    sigma_data = R(*np.meshgrid(theta_int, phi_int))
-    return simps_2d(theta_int, phi_int, sigma_data*np.sin(theta_int))
+    if method == 'simpson':
+        theta_int = np.linspace(theta_min, theta_max, N)
+        phi_int = np.linspace(phi_min, phi_max, N)
+
+        # sigma_data = R(*np.meshgrid(theta, phi, indexing='ij'))
+        sigma_data = R(*np.meshgrid(theta_int, phi_int))
+        return simps_2d(theta_int, phi_int, sigma_data*np.sin(theta_int))
+
+    theta_int, phi_int, weights = sphere_quadrature(N, theta_min, theta_max, phi_min, phi_max, method)
+    return np.sum(weights*R(theta_int, phi_int))
@@ -1,36 +1,257 @@
 import numpy as np
-from scipy.interpolate import RegularGridInterpolator
-from scipy.interpolate import interp1d
+import itertools
 
 def ndinterp(data, *args, method="linear", fill_value = np.nan):
     """given N-dimensional data, and args = x,y,z,..., return function f(args) that
-       iterpolates the data with method ('linear' or 'nearest')"""
-    fit = RegularGridInterpolator(args, data, method=method, fill_value=fill_value, bounds_error=False)
-    return lambda *args: fit(args)
+       iterpolates the data with method ('linear', 'nearest' or 'bspline'; other RegularGridInterpolator
+       methods are passed through to scipy)
 
-def remap_interpolate(data, variables, new_resolutions, method="linear", fill_value = np.nan):
+       data may be complex and may have trailing component dimensions, data[N1,...,ND,C]: all components
+       are interpolated with a single cell lookup, f(args)[...,C]"""
+    if method not in ('linear', 'nearest', 'bspline'):
+        from scipy.interpolate import RegularGridInterpolator
+        fit = RegularGridInterpolator(args, data, method=method, fill_value=fill_value, bounds_error=False)
+        return lambda *args: fit(args)
+
+    return grid_interpolant(data, *args, method=method, fill_value=fill_value)
+
+class grid_interpolant:
+    def __init__(self, data, *axes, method="linear", fill_value = np.nan):
+        """interpolant of data[N1,...,ND,...] on a rectilinear grid, returned by ndinterp
+           For 'bspline' (cubic B-spline), the prefiltered coefficients are computed once and cached,
+           so each evaluation costs only the local 4**D stencil. The spline is cubic in grid index (uniform
+           axes are located by arithmetic) and mirrored at the boundaries, as ndimage's mode='mirror'
+
+                data            N-d data (real or complex, trailing dimensions are carried along)
+                *axes           x,y,z,...
+                method          'linear', 'nearest' or 'bspline'
+                fill_value      value for points outside the domain (None extrapolates)     """
+        self.axes = axes
+        self.method = method
+        self.fill_value = fill_value
+        self.data = np.asarray(data)
+        self.coefficients = bspline_coefficients(self.data, len(axes)) if method == 'bspline' else self.data
+
+    def __call__(self, *points):
+        return self.plan(*points)(self.coefficients)
+
+    def plan(self, *points):
+        """interpolation_plan onto fixed points (apply it to self.coefficients)"""
+        return interpolation_plan(self.axes, *points, method=self.method, fill_value=self.fill_value)
+
+class interpolation_plan:
+    def __init__(self, axes, *points, method="linear", fill_value = np.nan):
+        """precomputed interpolation from a rectilinear grid onto fixed points: cells are located once
+           (by arithmetic on uniform axes), and each dataset is then a gather and a weighted sum
+
+                axes[D]         list of 1-d grid axes x,y,z,...
+                *points         D coordinate arrays (broadcastable) to interpolate onto
+                method          'linear', 'nearest' or 'bspline' (applied to bspline_coefficients of the data)
+                fill_value      value for points outside the domain (None extrapolates)     """
+        axes = [np.asarray(axis, dtype=float) for axis in axes]
+        if len(points) != len(axes):
+            raise ValueError(f"got {len(points)} coordinate arrays for a {len(axes)}-dimensional grid")
+
+        points = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in points])
+        self.shape = points[0].shape
+        self.grid_shape = tuple(len(axis) for axis in axes)
+        points = [x.ravel() for x in points]
+        self.index, self.weights = _grid_weights(axes, points, method)
+
+        self.fill_value = fill_value
+        self.out_of_bounds = None
+        if fill_value is not None:
+            out_of_bounds = np.zeros(len(points[0]), dtype=bool)
+            for axis, x in zip(axes, points):
+                out_of_bounds |= (x < axis.min()) | (x > axis.max())
+            if np.any(out_of_bounds):
+                self.out_of_bounds = out_of_bounds
+
+    def __call__(self, data, axis=0):
+        """interpolate data onto the points with a single lookup for all components
+                data[...,N1,...,ND,...]     real or complex data whose grid dimensions start at axis; dimensions
+                                            before are batch dimensions, dimensions after are components
+                axis                        position of the first grid dimension
+
+           Returns [...,points.shape,...]"""
+        data = np.asarray(data)
+        axis = axis % data.ndim
+        ndim = len(self.grid_shape)
+        if data.shape[axis:axis+ndim] != self.grid_shape:
+            raise ValueError(f"data of shape {data.shape} does not match the grid {self.grid_shape} at axis {axis}")
+
+        leading, trailing = data.shape[:axis], data.shape[axis+ndim:]
+        data = data.reshape(leading + (-1,) + trailing)
+        select = (slice(None),)*axis
+        expand = (slice(None),) + (np.newaxis,)*len(trailing)
+
+        value = 0
+        for idx, w in zip(self.index, self.weights):
+            value = value + data[select + (idx,)]*w[expand]
+        value = np.array(value, dtype=np.result_type(data, self.weights))
+
+        if self.out_of_bounds is not None:
+            value[select + (self.out_of_bounds,)] = self.fill_value
+        return value.reshape(leading + self.shape + trailing)
+
+def remap_interpolate(data, variables, new_resolutions, method="linear", fill_value = np.nan, separable=False, return_axes=False):
     """ Interpolate an existing dataset to a different resolution
                 data                  N-d data
                 variables[N]          list of 1-d variables     
                 new_resolutions[N]    list of new resolutions for each variable (optionally, a single number for all variables) 
                 method                method of interpolation
-                fill_value            fill value for values outside domain      """
+                fill_value            fill value for values outside domain
+                separable             If True, resample one axis at a time with 1-d kernels ('linear', 'nearest', 'cubic' or 'bspline')
+                                      instead of interpolating on the full N-d mesh of new points
+                return_axes           If True, return the new 1-d variables instead of their meshgrids      """
+    from scipy.interpolate import interp1d
 
     num_variables = len(variables)
     if not hasattr(new_resolutions, '__iter__'):
-        new_resolutions = np.ones(num_variables)*new_resolutions
-
-    fitted_function = ndinterp(data, *variables, method=method, fill_value=fill_value)
+        new_resolutions = np.ones(num_variables, dtype=int)*new_resolutions
 
     new_variables = []
     for variable, new_resolution in zip(variables, new_resolutions):
         x = np.arange(0, len(variable))
         f = interp1d(x,variable, kind="linear")
-        x_new = np.linspace(0, len(variable)-1, new_resolution)
+        x_new = np.linspace(0, len(variable)-1, int(new_resolution))
 
         new_variables.append( f(x_new) )
-    
-    new_mesh_variables = np.meshgrid(*new_variables, indexing='ij')
-    new_data = fitted_function(*new_mesh_variables)
 
+    if separable:
+        new_data = np.asarray(data)
+        for axis, (variable, new_variable) in enumerate(zip(variables, new_variables)):
+            new_data = _resample_axis(new_data, variable, new_variable, axis, method, fill_value)
+    else:
+        fitted_function = ndinterp(data, *variables, method=method, fill_value=fill_value)
+        new_data = fitted_function(*np.meshgrid(*new_variables, indexing='ij'))
+
+    if return_axes:
+        return new_variables, new_data
+
+    new_mesh_variables = np.meshgrid(*new_variables, indexing='ij')
     return new_mesh_variables, new_data
+
+def _resample_axis(data, variable, new_variable, axis, method, fill_value):
+    """interpolate data along one axis from variable to new_variable"""
+    if method == 'cubic':
+        from scipy.interpolate import make_interp_spline
+        variable = np.asarray(variable)
+        if len(variable) > 1 and variable[-1] < variable[0]:
+            variable, data = variable[::-1], np.flip(data, axis)
+        return make_interp_spline(variable, data, k=3, axis=axis)(new_variable)
+
+    data = np.moveaxis(data, axis, 0)
+    if method == 'bspline':
+        data = bspline_coefficients(data, 1)
+    plan = interpolation_plan([variable], new_variable, method=method, fill_value=fill_value)
+    return np.moveaxis(plan(data), 0, axis)
+
+def _grid_weights(grid, points, method="linear"):
+    """flat indices and weights that interpolate data on a rectilinear grid at the given points,
+       with the semantics of RegularGridInterpolator for points inside the domain (descending axes included)
+
+                grid[D]         list of 1-d axes
+                points[D]       list of coordinate arrays (all of the same shape)
+                method          'linear', 'nearest' or 'bspline' (cubic B-spline, applied to prefiltered coefficients)
+
+       Returns index[K,...], weights[K,...] such that f(points) = sum_k data.ravel()[index[k]]*weights[k],
+       with K = 2**D corners for 'linear', K = 1 for 'nearest' and K = 4**D for 'bspline'           """
+    if method not in ('linear', 'nearest', 'bspline'):
+        raise ValueError(f"method must be 'linear', 'nearest' or 'bspline' (got '{method}')")
+
+    shape = [len(axis) for axis in grid]
+    strides = np.cumprod([1] + shape[:0:-1])[::-1]
+
+    indices = []
+    distances = []
+    flipped = []
+    for axis, x in zip(grid, points):
+        axis = np.asarray(axis, dtype=float)
+        x = np.asarray(x, dtype=float)
+        flipped.append(len(axis) > 1 and axis[-1] < axis[0])
+        if len(axis) == 1:
+            indices.append(np.zeros(x.shape, dtype=np.intp))
+            distances.append(np.zeros(x.shape))
+            continue
+
+        # a descending axis is located on its reverse, and its indices are flipped back below
+        if flipped[-1]:
+            axis = axis[::-1]
+        if np.any(np.diff(axis) <= 0):
+            raise ValueError("grid axes must be strictly ascending or descending")
+
+        step = _uniform_step(axis)
+        if step is None:
+            i = np.searchsorted(axis, x, side='right') - 1
+        else:
+            with np.errstate(invalid='ignore'):
+                i = np.floor((x - axis[0])/step).astype(np.intp)
+        i = np.clip(i, 0, len(axis) - 2)
+        indices.append(i)
+        distances.append((x - axis[i])/(axis[i+1] - axis[i]))
+
+    def flat_index(idx):
+        return sum(stride*(n-1-i if flip else i) for stride, i, n, flip in zip(strides, idx, shape, flipped))
+
+    if method == 'nearest':
+        index = flat_index([np.where(t <= .5, i, np.minimum(i+1, n-1)) for i, t, n in zip(indices, distances, shape)])
+        # as with RegularGridInterpolator, points with nan coordinates interpolate to nan
+        weights = np.where(np.any(np.isnan(distances), axis=0), np.nan, 1)
+        return index[np.newaxis], weights[np.newaxis]
+
+    if method == 'bspline':
+        corners = [_bspline_stencil(i + t, n) for i, t, n in zip(indices, distances, shape)]
+    else:
+        # corners in the order of RegularGridInterpolator's hypercube
+        corners = [((i, 1 - t), (np.minimum(i+1, n-1), t)) for i, t, n in zip(indices, distances, shape)]
+    index = []
+    weights = []
+    for corner in itertools.product(*corners):
+        idx, w = zip(*corner)
+        index.append(flat_index(idx))
+        weight = np.ones(idx[0].shape)
+        for wd in w:
+            weight = weight*wd
+        weights.append(weight)
+
+    return np.array(index), np.array(weights)
+
+def _uniform_step(axis):
+    """the spacing of a uniform, ascending axis (cells are then found by arithmetic), or None"""
+    if len(axis) < 2:
+        return None
+    step = (axis[-1] - axis[0])/(len(axis) - 1)
+    if step > 0 and np.allclose(np.diff(axis), step, rtol=1e-9, atol=0):
+        return step
+    return None
+
+def _bspline_stencil(u, n):
+    """the 4 (index, weight) pairs of the cubic B-spline at fractional grid index u[...] on an axis of
+       length n, with indices mirrored at the boundaries (as ndimage's mode='mirror')"""
+    with np.errstate(invalid='ignore'):
+        base = np.floor(u).astype(np.intp)
+    t = u - np.floor(u)
+    weights = [(1 - t)**3/6, (3*t**3 - 6*t**2 + 4)/6, (-3*t**3 + 3*t**2 + 3*t + 1)/6, t**3/6]
+
+    period = max(2*(n - 1), 1)
+    stencil = []
+    for j, w in enumerate(weights):
+        i = np.mod(base - 1 + j, period)
+        stencil.append((np.where(i > n - 1, period - i, i), w))
+    return stencil
+
+def bspline_coefficients(data, ndim=None):
+    """prefilter data for cubic B-spline interpolation (mirror boundaries) along its first ndim axes
+       (default: all); complex data is filtered as real and imaginary parts"""
+    from scipy.ndimage import spline_filter1d
+
+    data = np.asarray(data)
+    if np.iscomplexobj(data):
+        return bspline_coefficients(data.real, ndim) + 1j*bspline_coefficients(data.imag, ndim)
+
+    coefficients = np.asarray(data, dtype=float)
+    for axis in range(data.ndim if ndim is None else ndim):
+        if data.shape[axis] > 1:
+            coefficients = spline_filter1d(coefficients, order=3, axis=axis, mode='mirror')
+    return coefficients
@@ -1,5 +1,7 @@
 import numpy as np
-from .interpolate import ndinterp
+from functools import lru_cache
+from .interpolate import ndinterp, interpolation_plan
+from .grids import spherical_grid
 
 def axis_angle(u, theta):
     """Create rotation matrix using angle-axis method
@@ -25,26 +27,141 @@ def rotate_to(vec_from, vec_to):
     vec_from = np.asarray(vec_from)
     vec_from = vec_from/np.linalg.norm(vec_from)
     
-    theta = np.arccos( np.dot(vec_to, vec_from) )
-    u = np.cross(vec_from, vec_to)
-    return axis_angle(u,theta)
+    return rotate_to_batch(vec_from, vec_to)[0]
+
+def axis_angle_batch(u, theta, quaternion=False):
+    """Create a stack of rotation matrices using the angle-axis method
+            u[N,3]          axis vectors
+            theta[N]        angles
+            quaternion      If True, return quaternions[N,4] (w,x,y,z) instead
+
+       Returns rot_matrix[N,3,3]    """
+    u = np.atleast_2d(u).astype(float)
+    u = u/np.linalg.norm(u, axis=-1, keepdims=True)
+    theta = np.asarray(theta, dtype=float)
+    theta = np.broadcast_to(theta, u.shape[:-1])
+
+    if quaternion:
+        return np.concatenate([np.cos(theta/2)[...,np.newaxis], np.sin(theta/2)[...,np.newaxis]*u], axis=-1)
+
+    ct = np.cos(theta)[...,np.newaxis,np.newaxis]
+    st = np.sin(theta)[...,np.newaxis,np.newaxis]
+    ux,uy,uz = np.moveaxis(u, -1, 0)
+    zero = np.zeros_like(ux)
+
+    cross = np.stack([np.stack([zero, -uz, uy], axis=-1),
+                      np.stack([uz, zero, -ux], axis=-1),
+                      np.stack([-uy, ux, zero], axis=-1)], axis=-2)
+    outer = u[...,:,np.newaxis]*u[...,np.newaxis,:]
+
+    return ct*np.eye(3) + st*cross + (1-ct)*outer
+
+def rotate_to_batch(vec_from, vec_to, quaternion=False):
+    """Create a stack of rotation matrices that rotate vec_from onto vec_to (shortest arc)
+            vec_from[N,3]   initial orientations (or a single [3] vector)
+            vec_to[N,3]     final orientations (or a single [3] vector)
+            quaternion      If True, return quaternions[N,4] (w,x,y,z) instead
+
+       Parallel pairs give the identity; antiparallel pairs give a rotation by pi about an axis perpendicular to vec_from
+
+       Returns rot_matrix[N,3,3]    """
+    vec_from = np.asarray(vec_from, dtype=float)
+    vec_to = np.asarray(vec_to, dtype=float)
+    vec_from, vec_to = np.broadcast_arrays(np.atleast_2d(vec_from), np.atleast_2d(vec_to))
+    vec_from = vec_from/np.linalg.norm(vec_from, axis=-1, keepdims=True)
+    vec_to = vec_to/np.linalg.norm(vec_to, axis=-1, keepdims=True)
 
-def rotate_discrete_data(sig, theta, phi, vec_from, vec_to):
+    u = np.cross(vec_from, vec_to)
+    sin = np.linalg.norm(u, axis=-1)
+    cos = np.sum(vec_from*vec_to, axis=-1)
+    theta = np.arctan2(sin, cos)
+
+    # degenerate axes: any axis works when parallel (theta = 0); when antiparallel,
+    # use the axis perpendicular to vec_from and the coordinate axis it is least aligned with
+    degenerate = sin < 1e-12
+    if np.any(degenerate):
+        v = vec_from[degenerate]
+        e = np.eye(3)[np.argmin(np.abs(v), axis=-1)]
+        u[degenerate] = np.cross(v, e)
+        theta[degenerate & (cos > 0)] = 0
+
+    return axis_angle_batch(u, theta, quaternion=quaternion)
+
+def quaternion_to_rotation(q):
+    """Convert quaternions to rotation matrices
+            q[...,4]        quaternions (w,x,y,z), need not be normalized
+
+       Returns rot_matrix[...,3,3]      """
+    q = np.asarray(q, dtype=float)
+    q = q/np.linalg.norm(q, axis=-1, keepdims=True)
+    w,x,y,z = np.moveaxis(q, -1, 0)
+
+    return np.stack([np.stack([1 - 2*(y**2 + z**2), 2*(x*y - z*w), 2*(x*z + y*w)], axis=-1),
+                     np.stack([2*(x*y + z*w), 1 - 2*(x**2 + z**2), 2*(y*z - x*w)], axis=-1),
+                     np.stack([2*(x*z - y*w), 2*(y*z + x*w), 1 - 2*(x**2 + y**2)], axis=-1)], axis=-2)
+
+def rotation_to_quaternion(rot_matrix):
+    """Convert rotation matrices to quaternions
+            rot_matrix[...,3,3]     rotation matrices
+
+       Returns q[...,4] (w,x,y,z), with w >= 0     """
+    R = np.asarray(rot_matrix, dtype=float)
+    trace = np.trace(R, axis1=-2, axis2=-1)
+    diag = np.diagonal(R, axis1=-2, axis2=-1)
+
+    # 4*(w^2, x^2, y^2, z^2), computed without cancellation; build q from its largest component
+    squares = np.stack([1 + trace, 1 + 2*diag[...,0] - trace, 1 + 2*diag[...,1] - trace, 1 + 2*diag[...,2] - trace], axis=-1)
+    k = np.argmax(squares, axis=-1)[...,np.newaxis]
+
+    s = R[...,2,1] - R[...,1,2], R[...,0,2] - R[...,2,0], R[...,1,0] - R[...,0,1]
+    p = R[...,0,1] + R[...,1,0], R[...,0,2] + R[...,2,0], R[...,1,2] + R[...,2,1]
+
+    # 4*q_k*q, for each choice of k
+    candidates = np.stack([np.stack([squares[...,0], s[0], s[1], s[2]], axis=-1),
+                           np.stack([s[0], squares[...,1], p[0], p[1]], axis=-1),
+                           np.stack([s[1], p[0], squares[...,2], p[2]], axis=-1),
+                           np.stack([s[2], p[1], p[2], squares[...,3]], axis=-1)], axis=-2)
+    q = np.take_along_axis(candidates, k[...,np.newaxis], axis=-2)[...,0,:]
+    q = q/np.linalg.norm(q, axis=-1, keepdims=True)
+
+    return np.where(q[...,:1] < 0, -q, q)
+
+def rotate_discrete_data(sig, theta, phi, vec_from, vec_to, method='interpolate', lmax=None):
     """Rotate an interpolated function to a primed system
             sig_1(theta,phi)        function to rotate
-            theta[N]                values of theta (from 0 to pi, uniform or non-uniform)
-            phi[N]                  values of phi (from 0 to 2*pi, uniform or non-uniform)
+            theta[N]                values of theta (from 0 to pi, uniform or non-uniform), or a spherical_grid
+            phi[N]                  values of phi (from 0 to 2*pi, uniform or non-uniform; None for a spherical_grid)
             vec_from[3]             initial orientation
             vec_to[3]               final orientation       
+            method                  'interpolate' (re-evaluate sig on the rotated mesh and interpolate) or
+                                    'harmonic' (rotate spherical harmonic coefficients, for band-limited sig;
+                                    the transform of each (sig, grid) pair is cached, so sig should not change)
+            lmax                    maximum degree of the harmonic expansion (see harmonic_rotator)
 
        Returns interpolated function in the primed coordiate system, sig'(theta,phi)"""
 
-    theta_mesh, phi_mesh = np.meshgrid(theta, phi, indexing='ij')
-    R = sig(theta_mesh, phi_mesh)
+    if method == 'harmonic':
+        if isinstance(theta, spherical_grid):
+            theta, phi = theta.theta, theta.phi
+        rot = rotate_to(vec_from = vec_from, vec_to = vec_to)
+        rotator = _cached_harmonic_rotator(sig, tuple(np.asarray(theta, dtype=float)), tuple(np.asarray(phi, dtype=float)), lmax)
+        return rotator.rotate(rot)
+    elif method != 'interpolate':
+        raise ValueError(f"method must be 'interpolate' or 'harmonic' (got '{method}')")
+
+    if isinstance(theta, spherical_grid):
+        grid = theta
+        theta, phi = grid.theta, grid.phi
+        theta_mesh, phi_mesh = grid.mesh
+        R = sig(theta_mesh, phi_mesh)
+        X,Y,Z = R*grid.rhat
+    else:
+        theta_mesh, phi_mesh = np.meshgrid(theta, phi, indexing='ij')
+        R = sig(theta_mesh, phi_mesh)
 
-    X = R*np.sin(theta_mesh)*np.cos(phi_mesh)
-    Y = R*np.sin(theta_mesh)*np.sin(phi_mesh)
-    Z = R*np.cos(theta_mesh)
+        X = R*np.sin(theta_mesh)*np.cos(phi_mesh)
+        Y = R*np.sin(theta_mesh)*np.sin(phi_mesh)
+        Z = R*np.cos(theta_mesh)
 
     rot = rotate_to(vec_from = vec_from, vec_to = vec_to)
     trans = np.tensordot(rot,np.array([X,Y,Z]), axes=(1,0))
@@ -59,6 +176,245 @@ def rotate_discrete_data(sig, theta, phi, vec_from, vec_to):
     R = sig(theta_p, phi_p)
     return ndinterp(R, theta, phi)
 
+def _real_sph_harm_norms(lmax):
+    """normalization N[l,m] (m = 0..lmax, zero for m > l) of the harmonics of real_sph_harm_table,
+       Y_lm = N[l,m] P_l^m cos(m phi) and Y_l,-m = N[l,m] P_l^m sin(m phi)"""
+    from scipy.special import gammaln
+
+    l, m = np.meshgrid(np.arange(lmax+1), np.arange(lmax+1), indexing='ij')
+    norm = np.sqrt((2*l+1)/(4*np.pi))*np.where(m == 0, 1, np.sqrt(2)*(-1.)**m)
+    norm = norm*np.exp((gammaln(np.abs(l-m)+1) - gammaln(l+m+1))/2)
+    return np.where(m <= l, norm, 0)
+
+def real_sph_harm_table(lmax, theta, phi):
+    """orthonormal real spherical harmonics for all degrees up to lmax
+            lmax            maximum degree
+            theta, phi      angles (broadcastable, any shape)
+
+       Returns Y[(lmax+1)**2, ...], indexed as Y[l*(l+1)+m], with m > 0 ~ cos(m*phi) and
+       m < 0 ~ sin(|m|*phi) (no Condon-Shortley phase, so that l = 1 is (y,z,x)/r)      """
+    from .special import associated_legendre_table
+
+    theta, phi = np.broadcast_arrays(np.asarray(theta, dtype=float), np.asarray(phi, dtype=float))
+    P = associated_legendre_table(lmax, np.cos(theta))
+    norm = _real_sph_harm_norms(lmax)
+    expand = (slice(None),) + (np.newaxis,)*theta.ndim
+
+    Y = np.empty(((lmax+1)**2,) + theta.shape)
+    for l in range(lmax+1):
+        m = np.arange(1, l+1)
+        Y[l*(l+1)] = norm[l,0]*P[l,0]
+        Y[l*(l+1)+m] = norm[l,m][expand]*P[l,m]*np.cos(m[expand]*phi)
+        Y[l*(l+1)-m] = norm[l,m][expand]*P[l,m]*np.sin(m[expand]*phi)
+
+    return Y
+
+def real_wigner_d(rot_matrix, lmax):
+    """real Wigner-D matrices, computed with the Ivanic-Ruedenberg recurrence
+            rot_matrix[3,3]     3d rotation matrix
+            lmax                maximum degree
+
+       Returns D[lmax+1], D[l] of shape [2l+1,2l+1] (indexed by m+l), such that
+       Y_l(rot_matrix.r) = D[l].Y_l(r) for the harmonics of real_sph_harm_table"""
+    rot_matrix = np.asarray(rot_matrix, dtype=float)
+
+    # the l = 1 harmonics are ordered (y,z,x)
+    order = [1,2,0]
+    R1 = rot_matrix[np.ix_(order, order)]
+    D = [np.ones((1,1)), R1]
+
+    for l in range(2, lmax+1):
+        m, n = np.meshgrid(np.arange(-l, l+1), np.arange(-l, l+1), indexing='ij')
+        abs_m = np.abs(m)
+        delta = (m == 0)
+
+        # previous block, padded by 2 on each side so that out-of-range rows read zero
+        prev = np.zeros((2*l+3, 2*l-1))
+        prev[2:-2] = D[l-1]
+
+        def P(i, a, b):
+            a = a + (l+1)
+            inner = np.clip(b, -(l-1), l-1) + (l-1)
+            r_1, r_0, r_m1 = R1[i+1,2], R1[i+1,1], R1[i+1,0]
+
+            # only the edge columns (b = -l, l) differ from the inner rule
+            result = r_0*prev[a,inner]
+            a_lo, a_hi = a[:,0], a[:,-1]
+            result[:,-1] = r_1*prev[a_hi,2*l-2] - r_m1*prev[a_hi,0]
+            result[:,0] = r_1*prev[a_lo,0] + r_m1*prev[a_lo,2*l-2]
+            return result
+
+        U = P(0, m, n)
+
+        V = np.where(m == 0, P(1, np.ones_like(m), n) + P(-1, -np.ones_like(m), n),
+            np.where(m > 0, P(1, m-1, n)*np.sqrt(1 + (m == 1)) - P(-1, -m+1, n)*(m != 1),
+                            P(1, m+1, n)*(m != -1) + P(-1, -m-1, n)*np.sqrt(1 + (m == -1))))
+
+        W = np.where(m > 0, P(1, np.minimum(m+1, l+1), n) + P(-1, np.maximum(-m-1, -(l+1)), n),
+            np.where(m < 0, P(1, np.maximum(m-1, -(l+1)), n) - P(-1, np.minimum(-m+1, l+1), n), 0))
+
+        denom = np.where(np.abs(n) < l, (l+n)*(l-n), 2*l*(2*l-1)).astype(float)
+        u = np.sqrt((l+m)*(l-m)/denom)
+        v = 0.5*np.sqrt((1+delta)*(l+abs_m-1)*(l+abs_m)/denom)*(1 - 2*delta)
+        w = -0.5*np.sqrt(np.clip((l-abs_m-1)*(l-abs_m), 0, None)/denom)*(1 - delta)
+
+        D.append(u*U + v*V + w*W)
+
+    return D[:lmax+1]
+
+# working memory (bytes) of one chunk of points in harmonic_rotator.evaluate
+harmonic_memory = 2**26
+
+class harmonic_rotator:
+    def __init__(self, sig, theta, phi, lmax=None):
+        """rotate a band-limited function on the sphere in spherical harmonic space: sig is sampled and
+           transformed once, and each rotation is applied to the coefficients. The transform is an FFT in phi
+           (least squares for non-uniform phi) followed by quadrature in theta, exact for Gauss-Legendre nodes
+           in cos(theta) and for equally spaced theta from 0 to pi (Clenshaw-Curtis), and small least squares
+           fits (one per m) for any other theta
+
+                sig(theta,phi)      function to rotate (real or complex)
+                theta[N]            values of theta (from 0 to pi), or a spherical_grid
+                phi[M]              values of phi (from 0 to 2*pi; None for a spherical_grid)
+                lmax                maximum degree of the expansion (default: N-1 for Gauss-Legendre nodes,
+                                    (N-1)//2 otherwise, and at most (M'-1)//2 for M' distinct values of phi)   """
+
+        if isinstance(theta, spherical_grid):
+            theta, phi = theta.theta, theta.phi
+        theta = np.asarray(theta, dtype=float)
+        phi = np.asarray(phi, dtype=float)
+
+        theta_weights, gauss = _theta_quadrature(theta)
+        endpoint = np.isclose(phi[-1] - phi[0], 2*np.pi)
+        Mp = len(phi) - 1 if endpoint else len(phi)
+        step = 2*np.pi/Mp
+        fft = np.allclose(np.diff(phi[:Mp]), step) and (endpoint or np.isclose(phi[-1] - phi[0] + step, 2*np.pi))
+
+        if lmax is None:
+            lmax = max(min(len(theta) - 1 if gauss else (len(theta) - 1)//2, (Mp - 1)//2), 0)
+        if 2*lmax+1 > Mp or lmax+1 > len(theta):
+            raise ValueError(f"a {len(theta)}x{len(phi)} grid cannot resolve degree lmax = {lmax}")
+        self.lmax = lmax
+
+        # azimuthal transform: C_m(theta) = int sig cos(m phi) dphi, S_m(theta) = int sig sin(m phi) dphi
+        theta_mesh, phi_mesh = np.meshgrid(theta, phi, indexing='ij')
+        data = np.asarray(sig(theta_mesh, phi_mesh))
+        m = np.arange(lmax+1)
+        if fft:
+            X = np.fft.fft(data[:,:Mp], axis=1)*step
+            X_pos = X[:,m]*np.exp(-1j*m*phi[0])
+            X_neg = X[:,-m % Mp]*np.exp(1j*m*phi[0])
+            C, S = (X_pos + X_neg)/2, 1j*(X_pos - X_neg)/2
+            if not np.iscomplexobj(data):
+                C, S = C.real, S.real
+        else:
+            A = np.concatenate([np.cos(np.outer(phi, m)), np.sin(np.outer(phi, m[1:]))], axis=1)
+            fit = np.linalg.lstsq(A, data.T, rcond=None)[0]
+            norm = np.where(m == 0, 2*np.pi, np.pi)[:,np.newaxis]
+            C = (norm*fit[:lmax+1]).T
+            S = np.concatenate([np.zeros_like(C[:,:1]), (norm[1:]*fit[lmax+1:]).T], axis=1)
+
+        # polar transform against the normalized legendre functions (the harmonics at phi = 0)
+        Y0 = real_sph_harm_table(lmax, theta, 0)
+        self.coefficients = np.zeros((lmax+1)**2, dtype=C.dtype)
+        for mm in range(lmax+1):
+            l = np.arange(mm, lmax+1)
+            legendre = Y0[l*(l+1) + mm]
+            norm = 2*np.pi if mm == 0 else np.pi
+            if theta_weights is not None:
+                c, s = legendre @ (theta_weights*C[:,mm]), legendre @ (theta_weights*S[:,mm])
+            else:
+                c, s = np.linalg.lstsq(legendre.T, np.stack([C[:,mm], S[:,mm]], axis=1)/norm, rcond=None)[0].T
+            self.coefficients[l*(l+1) + mm] = c
+            if mm > 0:
+                self.coefficients[l*(l+1) - mm] = s
+
+    def __call__(self, theta, phi):
+        """evaluate the (unrotated) expansion"""
+        return self.evaluate(self.coefficients, theta, phi)
+
+    def evaluate(self, coefficients, theta, phi):
+        """evaluate an expansion with the given coefficients[(lmax+1)**2] at theta, phi (broadcastable), as a sum
+           over m of (sum over l of c_lm N_lm P_l^m) cos/sin(m phi); a 2d mesh of theta and phi (either indexing)
+           is evaluated separably, other points in chunks of at most harmonic_memory bytes"""
+        lmax = self.lmax
+        theta, phi = np.broadcast_arrays(np.asarray(theta, dtype=float), np.asarray(phi, dtype=float))
+        shape = theta.shape
+        m = np.arange(lmax+1)[:,np.newaxis]
+
+        # coefficients as [l,m] tables of the cos and sin harmonics, normalization included
+        l, mm = np.meshgrid(np.arange(lmax+1), np.arange(lmax+1), indexing='ij')
+        valid = mm <= l
+        norm = _real_sph_harm_norms(lmax)
+        c_cos = np.where(valid, coefficients[np.where(valid, l*(l+1) + mm, 0)], 0)*norm
+        c_sin = np.where(valid & (mm > 0), coefficients[np.where(valid, l*(l+1) - mm, 0)], 0)*norm
+
+        if theta.ndim == 2:
+            for axis in (0, 1):
+                theta_1d = np.take(theta, 0, axis=1-axis)
+                phi_1d = np.take(phi, 0, axis=axis)
+                if np.all(theta == np.expand_dims(theta_1d, 1-axis)) and np.all(phi == np.expand_dims(phi_1d, axis)):
+                    A, B = self._legendre_sums(c_cos, c_sin, theta_1d)
+                    result = A.T @ np.cos(m*phi_1d) + B.T @ np.sin(m*phi_1d)
+                    return result if axis == 0 else result.T
+
+        theta, phi = theta.ravel(), phi.ravel()
+        out = np.empty(len(theta), dtype=np.result_type(coefficients, float))
+        chunk = max(1, harmonic_memory//(16*(lmax+1)*(2*lmax+1)))
+        for start in range(0, len(theta), chunk):
+            points = slice(start, start+chunk)
+            A, B = self._legendre_sums(c_cos, c_sin, theta[points])
+            m_phi = m*phi[points]
+            out[points] = np.sum(A*np.cos(m_phi) + B*np.sin(m_phi), axis=0)
+
+        return out.reshape(shape)
+
+    def _legendre_sums(self, c_cos, c_sin, theta):
+        """sums over l of c_cos[l,m] P_l^m(cos(theta)) and c_sin[l,m] P_l^m(cos(theta)), each [lmax+1, len(theta)]"""
+        from .special import associated_legendre_table
+
+        P = associated_legendre_table(self.lmax, np.cos(theta))[:,:self.lmax+1]
+        return np.einsum('lm,lmp->mp', c_cos, P), np.einsum('lm,lmp->mp', c_sin, P)
+
+    def rotate_coefficients(self, rot_matrix):
+        """coefficients of sig'(r) = sig(rot_matrix.r)"""
+        D = real_wigner_d(rot_matrix, self.lmax)
+        c = np.empty_like(self.coefficients)
+        for l in range(self.lmax+1):
+            block = slice(l*l, (l+1)**2)
+            c[block] = D[l].T @ self.coefficients[block]
+        return c
+
+    def rotate(self, rot_matrix):
+        """Returns the function in the primed coordinate system, sig'(theta,phi) = sig(rot_matrix.r),
+           as in rotate_discrete_data"""
+        c = self.rotate_coefficients(rot_matrix)
+        return lambda theta, phi: self.evaluate(c, theta, phi)
+
+def _theta_quadrature(theta):
+    """weights w[N] such that sum(w*f(theta)) is the integral of f sin(theta) over [0,pi] (None if theta is neither
+       Gauss-Legendre nodes in cos(theta) nor equally spaced from 0 to pi), and whether theta are Gauss-Legendre nodes"""
+    from .integrate import gauss_legendre_nodes, clenshaw_curtis_weights
+
+    N = len(theta)
+    x, w = gauss_legendre_nodes(N)
+    order = np.argsort(np.cos(theta))
+    if np.allclose(np.cos(theta)[order], x, rtol=0, atol=1e-10):
+        weights = np.empty_like(w)
+        weights[order] = w
+        return weights, True
+
+    equiangular = np.linspace(0, np.pi, N)
+    if N > 1 and (np.allclose(theta, equiangular) or np.allclose(theta, equiangular[::-1])):
+        return clenshaw_curtis_weights(N), False
+
+    return None, False
+
+@lru_cache(maxsize=8)
+def _cached_harmonic_rotator(sig, theta, phi, lmax):
+    """harmonic_rotator for a (sig, grid) pair; the grid axes are passed as tuples so that they hash"""
+    return harmonic_rotator(sig, np.array(theta), np.array(phi), lmax)
+
 def rotation_matrix_2d(angle):
     """Return a 2x2 rotation matrix by angle (radians)"""
 
@@ -72,6 +428,142 @@ def clip(data, domain):
     data[data>max_val] = max_val
     data[data<min_val] = min_val
 
+# approximate working memory (bytes) of rotation_plan_3d per grid point
+plan_bytes = 600
+
+class rotation_plan_2d:
+    def __init__(self, angle, r, phi, method = "linear"):
+        """Precomputed rotation of 2d vector fields on a fixed grid: the primed coordinates and
+           interpolation indices/weights are computed once, and each field is rotated with a single gather
+
+                angle           angle to rotate by
+                r[N1]           linear array of radial domain
+                phi[N2]         linear array of phi domain
+                method          one of ['linear', 'nearest']; the interpolation method to be used. Defaults to linear"""
+
+        r = np.asarray(r)
+        phi = np.asarray(phi)
+        self.rot = rotation_matrix_2d(angle)
+
+        # construct R, PHI in rotated (primed) coordinates
+        R,PHI = np.meshgrid(r,phi, indexing='ij')
+        X = R*np.cos(PHI)
+        Y = R*np.sin(PHI)
+        Xp,Yp = np.einsum('ij,j...->i...', self.rot.T, np.array([X,Y]))
+
+        Rp = np.sqrt(Xp**2 + Yp**2)
+        PHIp = np.arctan2(Yp,Xp) 
+        PHIp[PHIp<0] += 2*np.pi
+
+        # clip data so that interpolation doesn't produce nan's for out of bounds domain
+        clip(Rp, r)
+        clip(PHIp, phi)
+
+        if len(r) == 1:
+            self.shape = (len(phi),)
+            self.interpolation = interpolation_plan((phi,), PHIp.ravel(), method=method, fill_value=None)
+        else:
+            self.shape = R.shape
+            self.interpolation = interpolation_plan((r,phi), Rp.ravel(), PHIp.ravel(), method=method, fill_value=None)
+
+    def __call__(self, data, color = None):
+        """Rotate a 2d vector field. Return the rotated data.
+
+                data[...,2,N1,N2]   vector field (any number of leading field dimensions)
+                color[...,N1,N2]    (optional) color data
+
+           Returns [...,2,...] (or [...,3,...] with color) on the grid, squeezed if len(r) == 1"""
+        fields = _stack_fields(data, color, 2, self.interpolation.grid_shape)
+        fields = self.interpolation(fields, axis=-len(self.interpolation.grid_shape))
+        fields[...,:2,:] = self.rot[:,0,np.newaxis]*fields[...,0:1,:] + self.rot[:,1,np.newaxis]*fields[...,1:2,:]
+
+        return fields.reshape(fields.shape[:-1] + self.shape)
+
+class rotation_plan_3d:
+    def __init__(self, rot_matrix, r, theta = None, phi = None, method = 'linear', rows = None):
+        """Precomputed rotation of 3d vector fields on a fixed grid: the primed coordinates, interpolation
+           indices/weights and basis projection T[i,j] = hat_a[i] rot^T[a,b] e'_j[b] are computed once,
+           and each field is rotated with a single gather and multiply
+
+                rot_matrix[3,3]    3d rotation matrix
+                r[N1]              linear array of radial domain (or a spherical_grid with r)
+                theta[N2]          linear array of theta domain
+                phi[N3]            linear array of phi domain
+                method             one of ['linear', 'nearest']; the interpolation method to be used. Defaults to linear
+                rows               (optional) slice of r to plan the output for (the source grid is always all of r)"""
+
+        grid = r if isinstance(r, spherical_grid) else None
+        if grid is not None:
+            r, theta, phi = grid.r, grid.theta, grid.phi
+
+        rot_matrix = np.asarray(rot_matrix)
+        r = np.asarray(r)
+        theta = np.asarray(theta)
+        phi = np.asarray(phi)
+
+        # construct R, THETA, PHI in rotated (primed) coordinates
+        r_out = r if rows is None else r[rows]
+        R,THETA,PHI = np.meshgrid(r_out,theta,phi, indexing='ij')
+        X = R*np.sin(THETA)*np.cos(PHI)
+        Y = R*np.sin(THETA)*np.sin(PHI)
+        Z = R*np.cos(THETA)
+        Xp,Yp,Zp = np.einsum('ij,j...->i...', rot_matrix, np.array([X,Y,Z]))
+
+        Rp = np.sqrt(Xp**2 + Yp**2 + Zp**2)
+        THETAp = np.arccos(Zp/Rp)
+        PHIp = np.arctan2(Yp,Xp) 
+        PHIp[PHIp<0] += 2*np.pi
+        
+        # clip data so that interpolation doesn't produce nan's for out of bounds domain
+        clip(Rp, r)
+        clip(THETAp, theta)
+        clip(PHIp, phi)
+
+        if len(r) == 1:
+            self.shape = (len(theta), len(phi))
+            self.interpolation = interpolation_plan((theta,phi), THETAp.ravel(), PHIp.ravel(), method=method, fill_value=None)
+        else:
+            self.shape = R.shape
+            self.interpolation = interpolation_plan((r,theta,phi), Rp.ravel(), THETAp.ravel(), PHIp.ravel(),
+                                                    method=method, fill_value=None)
+
+        THETA, PHI, THETAp, PHIp = map(np.ravel, [THETA, PHI, THETAp, PHIp])
+        if grid is not None:
+            xhat, yhat, zhat = np.broadcast_to(grid.cart_basis[:,:,np.newaxis], (3,3) + R.shape).reshape(3,3,-1)
+        else:
+            xhat = np.array([np.sin(THETA)*np.cos(PHI), np.cos(THETA)*np.cos(PHI), -np.sin(PHI)])
+            yhat = np.array([np.sin(THETA)*np.sin(PHI), np.cos(THETA)*np.sin(PHI), np.cos(PHI)])
+            zhat = np.array([np.cos(THETA), -np.sin(THETA), np.zeros_like(THETA)])
+
+        rhat_p = np.array([np.sin(THETAp)*np.cos(PHIp), np.sin(THETAp)*np.sin(PHIp), np.cos(THETAp)])
+        that_p = np.array([np.cos(THETAp)*np.cos(PHIp), np.cos(THETAp)*np.sin(PHIp), -np.sin(THETAp)])
+        phat_p = np.array([-np.sin(PHIp), np.cos(PHIp), np.zeros_like(THETAp)])
+
+        self.T = np.einsum('aip,ba,jbp->ijp', np.array([xhat,yhat,zhat]), rot_matrix,
+                           np.array([rhat_p,that_p,phat_p]))
+
+    def __call__(self, data, color = None):
+        """Rotate a 3d vector field. Return the rotated data.
+
+                data[...,3,N1,N2,N3]   vector field (any number of leading field dimensions)
+                color[...,N1,N2,N3]    (optional) color data
+
+           Returns [...,3,...] (or [...,4,...] with color) on the grid, squeezed if len(r) == 1"""
+        fields = _stack_fields(data, color, 3, self.interpolation.grid_shape)
+        fields = self.interpolation(fields, axis=-len(self.interpolation.grid_shape))
+        fields[...,:3,:] = self.T[:,0]*fields[...,0:1,:] + self.T[:,1]*fields[...,1:2,:] + self.T[:,2]*fields[...,2:3,:]
+
+        return fields.reshape(fields.shape[:-1] + self.shape)
+
+def _stack_fields(data, color, ndim, grid_shape):
+    """stack data[...,D,N1,...] and color[...,N1,...] (ndim grid dimensions) as components [...,D+1,grid_shape]"""
+    data = np.asarray(data)
+    fields = data.reshape(data.shape[:-ndim] + grid_shape)
+    if color is not None:
+        color = np.asarray(color)
+        fields = np.concatenate([fields, color.reshape(color.shape[:-ndim] + (1,) + grid_shape)], axis=-len(grid_shape)-1)
+    return fields
+
 def rotate_vector_field_2d(angle, data, r, phi, method = "linear", color = None):
     """Rotate a 2d vector field. Return the rotated data.
             
@@ -80,131 +572,163 @@ def rotate_vector_field_2d(angle, data, r, phi, method = "linear", color = None)
             r[N1]           linear array of radial domain
             phi[N1]         linear array of phi domain
             method          one of ['linear', 'nearest']; the interpolation method to be used. Defaults to linear
-            color[N1,N2]    (optional) color data            """
+            color[N1,N2]    (optional) color data
 
-    # rotate vectors
-    data = np.asarray(data)
-    r = np.asarray(r)
-    phi = np.asarray(phi)
-
-    U = data[0,...]
-    V = data[1,...]
-    Rot = rotation_matrix_2d(angle)
-    U,V = np.einsum('ij,j...->i...', Rot, np.array([U,V]))
-
-    # construct R, PHI in rotated (primed) coordinates
-    R,PHI = np.meshgrid(r,phi, indexing='ij')
-    X = R*np.cos(PHI)
-    Y = R*np.sin(PHI)
-    Xp,Yp = np.einsum('ij,j...->i...', Rot.T, np.array([X,Y]))
-
-    Rp = np.sqrt(Xp**2 + Yp**2)
-    PHIp = np.arctan2(Yp,Xp) 
-    PHIp[PHIp<0] += 2*np.pi
-    
-    # clip data so that interpolation doesn't produce nan's for out of bounds domain
-    clip(Rp, r)
-    clip(PHIp, phi)
-
-    if len(r) == 1:
-        args = (phi,)
-        args_p = (PHIp.squeeze(),)
-        U,V = map(np.squeeze, [U,V])
-    else:
-        args = r,phi
-        args_p = Rp,PHIp
+       For many fields on the same grid, build a rotation_plan_2d once instead      """
 
-    # rotate position of vectors using interpolation
-    fU = ndinterp(U,*args, method=method)
-    U = fU(*args_p)
-    fV = ndinterp(V,*args, method=method)
-    V = fV(*args_p)
+    return rotation_plan_2d(angle, r, phi, method)(data, color)
 
-    if color is not None:
-        fC = ndinterp(color,r,phi, method=method)
-        C = fC(Rp, PHIp)
-        return np.array([U,V,C])
-
-    return np.array([U,V])
-
-def rotate_vector_field_3d(rot_matrix, data, r, theta, phi, method = 'linear', color = None):
+def rotate_vector_field_3d(rot_matrix, data, r, theta = None, phi = None, method = 'linear', color = None, max_memory = None, out = None):
     """Rotate a 3d vector field. Return the rotated data.
             
             rot_matrix[3,3]    3d rotation matrix
-            data[3,N1,N2,N3]   vector field
-            r[N1]              linear array of radial domain
+            data[3,N1,N2,N3]   vector field (array or h5py dataset)
+            r[N1]              linear array of radial domain (or a spherical_grid with r, for theta and phi)
             theta[N2]          linear array of theta domain
             phi[N3]            linear array of phi domain
             method             one of ['linear', 'nearest']; the interpolation method to be used. Defaults to linear
-            color[N1,N2,N3]    (optional) color data            """
-
-    # rotate position of vectors
-    data = np.asarray(data)
-    r = np.asarray(r)
-    theta = np.asarray(theta)
-    phi = np.asarray(phi)
+            color[N1,N2,N3]    (optional) color data
+            max_memory         (optional) working memory budget in bytes; the grid is rotated in slabs of r
+            out                (optional) array or h5py dataset to write the result into (implies slabs)
 
-    U = data[0,...]
-    V = data[1,...]
-    W = data[2,...]
+       For many fields on the same grid, build a rotation_plan_3d once instead      """
 
-    # U,V,W = np.einsum('ij,j...->i...', Rot, np.array([U,V,W]))
+    if max_memory is None and out is None:
+        return rotation_plan_3d(rot_matrix, r, theta, phi, method)(data, color)
 
-    # construct R, THETA, PHI in rotated (primed) coordinates
-    R,THETA,PHI = np.meshgrid(r,theta,phi, indexing='ij')
-    X = R*np.sin(THETA)*np.cos(PHI)
-    Y = R*np.sin(THETA)*np.sin(PHI)
-    Z = R*np.cos(THETA)
-    Xp,Yp,Zp = np.einsum('ij,j...->i...', rot_matrix, np.array([X,Y,Z]))
-
-    Rp = np.sqrt(Xp**2 + Yp**2 + Zp**2)
-    THETAp = np.arccos(Zp/Rp)
-    PHIp = np.arctan2(Yp,Xp) 
-    PHIp[PHIp<0] += 2*np.pi
-    
-    # clip data so that interpolation doesn't produce nan's for out of bounds domain
-    clip(Rp, r)
-    clip(THETAp, theta)
-    clip(PHIp, phi)
+    grid = r if isinstance(r, spherical_grid) else None
+    if grid is not None:
+        r, theta, phi = grid.r, grid.theta, grid.phi
 
+    if not hasattr(data, 'shape'):
+        data = np.asarray(data)
+    if color is not None and not hasattr(color, 'shape'):
+        color = np.asarray(color)
+    r = np.asarray(r)
 
-    # rotate vectors using interpolation
-    if len(r) == 1:
-        args = theta,phi
-        args_p = THETAp.squeeze(),PHIp.squeeze()
-        U,V,W = map(np.squeeze, [U,V,W])
+    N1, plane = len(r), len(theta)*len(phi)
+    if max_memory is None:
+        rows_per_slab = N1
     else:
-        args = r,theta,phi
-        args_p = Rp,THETAp,PHIp
-
-    fU = ndinterp(U,*args, method=method)
-    U = fU(*args_p)
-    fV = ndinterp(V,*args, method=method)
-    V = fV(*args_p)
-    fW = ndinterp(W,*args, method=method)
-    W = fW(*args_p)
-
-    xhat = np.array([np.sin(THETA)*np.cos(PHI), np.cos(THETA)*np.cos(PHI), -np.sin(PHI)])
-    yhat = np.array([np.sin(THETA)*np.sin(PHI), np.cos(THETA)*np.sin(PHI), np.cos(PHI)])
-    zhat = np.array([np.cos(THETA), -np.sin(THETA), np.zeros_like(THETA)])
-
-    rhat_p = np.array([np.sin(THETAp)*np.cos(PHIp), np.sin(THETAp)*np.sin(PHIp), np.cos(THETAp)])
-    that_p = np.array([np.cos(THETAp)*np.cos(PHIp), np.cos(THETAp)*np.sin(PHIp), -np.sin(THETAp)])
-    phat_p = np.array([-np.sin(PHIp), np.cos(PHIp), np.zeros_like(THETAp)])
-
-    U,V,W = U*rhat_p + V*that_p + W*phat_p
-    U,V,W = np.einsum('ij,j...->i...', rot_matrix.T, np.array([U,V,W]))
-    U,V,W = U*xhat + V*yhat + W*zhat
-
-    if len(r) == 1:
-        U,V,W = map(np.squeeze, [U,V,W])
-
+        # the plan and its temporaries take ~plan_bytes per point; source, fields and result add per component
+        ncomp = np.prod(data.shape[:-3]) + (color is not None)
+        bytes_per_row = plane*(plan_bytes + 3*16*ncomp)
+        rows_per_slab = int(np.clip(max_memory//bytes_per_row, 1, N1))
+
+    if out is None:
+        shape = data.shape[:-4] + (data.shape[-4] + (color is not None),)
+        shape += (len(theta), len(phi)) if N1 == 1 else (N1, len(theta), len(phi))
+        dtype = np.result_type(data.dtype, float) if color is None else np.result_type(data.dtype, color.dtype, float)
+        out = np.empty(shape, dtype=dtype)
+
+    for start in range(0, N1, rows_per_slab):
+        rows = slice(start, min(start + rows_per_slab, N1))
+        plan = rotation_plan_3d(rot_matrix, r if grid is None else grid, theta, phi, method, rows=rows)
+
+        # rotations preserve r, so each slab reads only the source rows it interpolates from
+        interpolation = plan.interpolation
+        lo, hi = interpolation.index.min()//plane, interpolation.index.max()//plane + 1
+        if N1 > 1:
+            interpolation.index -= lo*plane
+            interpolation.grid_shape = (hi - lo,) + interpolation.grid_shape[1:]
+        source = np.asarray(data[...,lo:hi,:,:])
+        source_color = None if color is None else np.asarray(color[...,lo:hi,:,:])
+
+        if N1 == 1:
+            out[...] = plan(source, source_color)
+        else:
+            out[...,rows,:,:] = plan(source, source_color)
+
+    return out
+
+def rotate_vector_field_series(rotation, data, *grid, method = 'linear', color = None, workers = None, out = None):
+    """Rotate a time series of 2d or 3d vector fields in a process pool. Return the rotated series.
+
+            rotation            angle (2d, grid = r, phi) or rot_matrix[3,3] (3d, grid = r, theta, phi)
+            data[T,D,...]       vector field snapshots (D = 2 or 3; array or h5py dataset)
+            *grid               r[N1], phi[N2] (2d) or r[N1], theta[N2], phi[N3] (3d)
+            method              one of ['linear', 'nearest']; the interpolation method to be used. Defaults to linear
+            color[T,...]        (optional) color data snapshots
+            workers             number of worker processes (default: number of CPUs; 1 runs in this process)
+            out                 (optional) array or h5py dataset to write the result into
+
+       Inputs and outputs are exchanged through shared memory; every worker builds its own rotation plan once"""
+    import os
+    from multiprocessing import shared_memory
+    from concurrent.futures import ProcessPoolExecutor
+
+    if len(grid) not in (2, 3):
+        raise ValueError(f"grid must be (r, phi) or (r, theta, phi) (got {len(grid)} arrays)")
+    grid = tuple(np.asarray(g) for g in grid)
+    if not hasattr(data, 'shape'):
+        data = np.asarray(data)
+    if color is not None and not hasattr(color, 'shape'):
+        color = np.asarray(color)
+
+    T = data.shape[0]
+    shape = grid[1:] if len(grid[0]) == 1 else grid
+    shape = (T, len(grid) + (color is not None)) + tuple(len(g) for g in shape)
+    dtype = np.result_type(data.dtype, float) if color is None else np.result_type(data.dtype, color.dtype, float)
+
+    workers = os.cpu_count() if workers is None else workers
+    if workers == 1:
+        plan_class = rotation_plan_2d if len(grid) == 2 else rotation_plan_3d
+        result = plan_class(rotation, *grid, method)(data[...], None if color is None else color[...])
+        if out is None:
+            return result
+        out[...] = result
+        return out
+
+    buffers = [('data', data.shape, data.dtype, data), ('out', shape, dtype, None)]
     if color is not None:
-        fC = ndinterp(color,*args, method=method)
-        C = fC(*args_p)
-        return np.array([U,V,W,C])
-
-    return np.array([U,V,W])
+        buffers.append(('color', color.shape, color.dtype, color))
+
+    step = max(1, -(-T//(4*workers)))
+    memory, views = [], {}
+    try:
+        for key, buffer_shape, buffer_dtype, source in buffers:
+            size = int(np.prod(buffer_shape))*np.dtype(buffer_dtype).itemsize
+            memory.append(shared_memory.SharedMemory(create=True, size=max(size, 1)))
+            views[key] = np.ndarray(buffer_shape, dtype=buffer_dtype, buffer=memory[-1].buf)
+            if source is not None:
+                for start in range(0, T, step):
+                    views[key][start:start+step] = source[start:start+step]
+
+        specs = {key: (shm.name, view.shape, view.dtype) for shm, (key, view) in zip(memory, views.items())}
+        with ProcessPoolExecutor(workers, initializer=_series_init,
+                                 initargs=(rotation, grid, method, specs)) as pool:
+            for future in [pool.submit(_series_rotate, start, min(start+step, T)) for start in range(0, T, step)]:
+                future.result()
+
+        if out is None:
+            return np.array(views['out'])
+        for start in range(0, T, step):
+            out[start:start+step] = views['out'][start:start+step]
+        return out
+
+    finally:
+        views.clear()
+        for shm in memory:
+            shm.close()
+            shm.unlink()
+
+def _series_init(rotation, grid, method, specs):
+    """worker initializer for rotate_vector_field_series: build the plan and attach the shared arrays"""
+    from multiprocessing import shared_memory
+    global _series_plan, _series_arrays
+
+    plan_class = rotation_plan_2d if len(grid) == 2 else rotation_plan_3d
+    _series_plan = plan_class(rotation, *grid, method)
+    _series_arrays = {}
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _series_arrays[key] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+def _series_rotate(start, stop):
+    """worker task for rotate_vector_field_series: rotate snapshots [start,stop)"""
+    data = _series_arrays['data'][1][start:stop]
+    color = _series_arrays['color'][1][start:stop] if 'color' in _series_arrays else None
+    _series_arrays['out'][1][start:stop] = _series_plan(data, color)
 
 if __name__ == "__main__":
     # test rotate_vector_field_2d
@@ -3,12 +3,11 @@ special defines any additional special functions on top of scipy.special
 """
 
 import numpy as np
-import sympy
-import scipy
-from scipy import special, integrate, misc
+from scipy import special, integrate
 import enum
 from functools import lru_cache
-from math import factorial
+from math import factorial, lgamma, exp, prod
+from .grids import spherical_grid
 
 def spherical_hn(n, z, derivative=False):
     """spherical hankel function of the first kind or its derivative
@@ -19,6 +18,197 @@ def spherical_hn(n, z, derivative=False):
 
     return special.spherical_jn(n,z,derivative) + 1j*special.spherical_yn(n,z,derivative)
 
+def spherical_bessel_table(nmax, z):
+    """spherical bessel functions j_n, y_n, the hankel function h_n = j_n + i y_n and their
+       derivatives for all orders 0..nmax; y_n from upward recurrence, j_n from upward recurrence
+       where |z| exceeds every order and from Miller's downward recurrence elsewhere, and the
+       derivatives from f_n' = f_{n-1} - (n+1)/z f_n
+
+            nmax: int                maximum order
+            z: array[complex/float]  argument (any shape)
+
+       returns (jn, yn, hn, jn_p, yn_p, hn_p), each [nmax+1, ...]                       """
+
+    z = np.asarray(z)
+    shape = z.shape
+    dtype = complex if np.iscomplexobj(z) else float
+    z = z.ravel().astype(dtype)
+    N = nmax + 1        # one extra order for the derivative of order nmax
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # y_n, upward
+        yn = np.zeros((N+1, len(z)), dtype=dtype)
+        yn[0] = -np.cos(z)/z
+        yn[1] = -np.cos(z)/z**2 - np.sin(z)/z
+        for n in range(1, N):
+            yn[n+1] = (2*n+1)/z*yn[n] - yn[n-1]
+
+        # j_n, upward where every order is well below |z| (stable there, kept away from the turning
+        # point n ~ Re z and from large Im z) and with Miller's downward recurrence elsewhere, whose
+        # loop then starts at an order of O(nmax + |Im z|) rather than O(|z|)
+        jn = np.zeros((N+1, len(z)), dtype=dtype)
+        upward = np.abs(z.real) > 2*(N+1 + np.abs(z.imag))
+        jn[:,upward] = _jn_upward(N, z[upward])
+        jn[:,~upward] = _jn_downward(N, z[~upward])
+
+        zero = z == 0
+        jn[:,zero] = 0
+        jn[0,zero] = 1
+
+        # derivatives
+        jn_p = np.empty((N, len(z)), dtype=dtype)
+        yn_p = np.empty((N, len(z)), dtype=dtype)
+        jn_p[0] = -jn[1]
+        yn_p[0] = -yn[1]
+        n = np.arange(1, N)[:,np.newaxis]
+        jn_p[1:] = jn[:-2] - (n+1)/z*jn[1:-1]
+        yn_p[1:] = yn[:-2] - (n+1)/z*yn[1:-1]
+        jn_p[1:,zero] = np.where(n == 1, 1/3, 0)
+
+    jn, yn = jn[:N], yn[:N]
+    tables = (jn, yn, jn + 1j*yn, jn_p, yn_p, jn_p + 1j*yn_p)
+    return tuple(table.reshape((N,) + shape) for table in tables)
+
+def _jn_upward(N, z):
+    """j_n(z) for orders 0..N from the upward recurrence (stable for N < |z|), [N+1, len(z)]"""
+    jn = np.zeros((N+1, len(z)), dtype=z.dtype)
+    jn[0] = np.sin(z)/z
+    jn[1] = np.sin(z)/z**2 - np.cos(z)/z
+    for n in range(1, N):
+        jn[n+1] = (2*n+1)/z*jn[n] - jn[n-1]
+    return jn
+
+def _jn_downward(N, z):
+    """j_n(z) for orders 0..N from Miller's downward recurrence, rescaled to avoid overflow, [N+1, len(z)]"""
+    zmax = np.max(np.abs(z)) if len(z) else 0
+    start = int(max(N, zmax) + 20 + 4*zmax**(1/3))
+    jn = np.zeros((N+1, len(z)), dtype=z.dtype)
+    j_next = np.zeros(len(z), dtype=z.dtype)
+    j_current = np.full(len(z), 1e-100, dtype=z.dtype)
+    for n in range(start, 0, -1):
+        j_prev = (2*n+1)/z*j_current - j_next
+        j_next, j_current = j_current, j_prev
+        if n-1 <= N:
+            jn[n-1] = j_current
+        large = np.abs(j_current) > 1e200
+        if np.any(large):
+            j_next[large] *= 1e-200
+            j_current[large] *= 1e-200
+            jn[:,large] *= 1e-200
+
+    # normalize with whichever of j_0, j_1 is larger
+    j0 = np.sin(z)/z
+    j1 = np.sin(z)/z**2 - np.cos(z)/z
+    scale = np.where(np.abs(j0) >= np.abs(j1), j0/jn[0], j1/jn[1])
+    return jn*scale
+
+def associated_legendre_table(nmax, x, deriv=False):
+    """associated legendre functions P_n^m(x) for all orders and degrees up to nmax,
+       computed in one pass with the three-term recurrences (Condon-Shortley phase included)
+
+            nmax: int       maximum order
+            x: array        argument (any shape, -1 <= x <= 1)
+            deriv: bool     If True, also return the first derivative dP_n^m/dx
+
+        returns P[nmax+1, 2*nmax+1, ...] (and dP), indexed as P[n,m] where negative m
+        wraps around (P[n,-m]); entries with |m| > n are zero                            """
+
+    x = np.asarray(x, dtype=float)
+    shape = x.shape
+    x = x.ravel()
+    size = 2*nmax + 1
+    P = np.zeros((nmax+1, size, len(x)))
+
+    # diagonal: P_m^m = (-1)^m (2m-1)!! (1-x^2)^(m/2)
+    sin_x = np.sqrt(np.clip(1 - x**2, 0, None))
+    P[0,0] = 1
+    for n in range(1, nmax+1):
+        P[n,n] = -(2*n-1)*sin_x*P[n-1,n-1]
+
+    # upward in n for every m >= 0 at once
+    for n in range(1, nmax+1):
+        P[n,n-1] = (2*n-1)*x*P[n-1,n-1]
+        m = np.arange(n-1)[:,np.newaxis]
+        P[n,:n-1] = ((2*n-1)*x*P[n-1,:n-1] - (n+m-1)*P[n-2,:n-1])/(n-m)
+
+    # negative m: P_n^-m = (-1)^m (n-m)!/(n+m)! P_n^m
+    n, m = np.meshgrid(np.arange(nmax+1), np.arange(1,nmax+1), indexing='ij')
+    with np.errstate(invalid='ignore'):
+        factor = np.where(m <= n, (-1.)**m*np.exp(special.gammaln(n-m+1) - special.gammaln(n+m+1)), 0)
+    P[:,:nmax:-1] = factor[...,np.newaxis]*P[:,1:nmax+1]
+
+    if not deriv:
+        return P.reshape(P.shape[:2] + shape)
+
+    # (x^2-1) dP_n^m = n x P_n^m - (n+m) P_{n-1}^m, valid for negative m as well
+    m = np.arange(size)
+    m = np.where(m <= nmax, m, m - size)[:,np.newaxis]
+    dP = np.zeros_like(P)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for n in range(1, nmax+1):
+            dP[n] = (n*x*P[n] - (n+m)*P[n-1])/(x**2 - 1)
+
+    # at x = +-1 the derivative is finite for m = 0 and |m| >= 2, singular for |m| = 1
+    edge = np.abs(x) == 1
+    if np.any(edge):
+        sign = np.sign(x[edge])
+        dP[...,edge] = 0
+        for n in range(1, nmax+1):
+            dP[n,0,edge] = sign**(n+1)*n*(n+1)/2
+            dP[n,1,edge] = dP[n,-1,edge] = np.nan
+            if n >= 2:
+                dP[n,2,edge] = -sign**(n+1)*(n-1)*n*(n+1)*(n+2)/4
+                dP[n,-2,edge] = factor[n,1]*dP[n,2,edge]
+
+    return P.reshape(P.shape[:2] + shape), dP.reshape(dP.shape[:2] + shape)
+
+def _legendre_column(n, m, x, deriv=False):
+    """P_n^m(x) (or its derivative) of a single order and degree, from the upward recurrence in n for |m|
+       alone, O(n) (the values of associated_legendre_table[n,m]); scalar x is evaluated with python floats"""
+    scalar = np.ndim(x) == 0
+    x = float(x) if scalar else np.asarray(x, dtype=float)
+    am = abs(m)
+
+    # P_|m|^|m| = (-1)^|m| (2|m|-1)!! (1-x^2)^(|m|/2), then upward in n
+    diagonal = (-1.)**am*prod(range(1, 2*am, 2))
+    sin_x = max(1 - x*x, 0.)**.5 if scalar else np.sqrt(np.clip(1 - x**2, 0, None))
+    P_prev, P = 0*x, diagonal*sin_x**am
+    for k in range(am+1, n+1):
+        P_prev, P = P, ((2*k-1)*x*P - (k+am-1)*P_prev)/(k-am)
+
+    # negative m: P_k^-m = (-1)^m (k-m)!/(k+m)! P_k^m
+    def factor(k):
+        return (-1.)**am*exp(lgamma(k-am+1) - lgamma(k+am+1)) if m < 0 and k >= am else 1.
+
+    if not deriv:
+        return factor(n)*P
+
+    # (x^2-1) dP_n^m = n x P_n^m - (n+m) P_{n-1}^m, with the finite limits of associated_legendre_table at x = +-1
+    if n == 0:
+        return 0*x
+    P_prev = factor(n-1)*P_prev if n-1 >= am else 0*x
+
+    def edge_limit(sign):
+        if am == 0:
+            return sign**(n+1)*n*(n+1)/2
+        if am == 1:
+            return np.nan
+        if am == 2:
+            return -factor(n)*sign**(n+1)*(n-1)*n*(n+1)*(n+2)/4
+        return 0*sign
+
+    if scalar:
+        if abs(x) == 1:
+            return edge_limit(x)
+        return (n*x*factor(n)*P - (n+m)*P_prev)/(x*x - 1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dP = (n*x*factor(n)*P - (n+m)*P_prev)/(x**2 - 1)
+    edge = np.abs(x) == 1
+    if np.any(edge):
+        dP = np.where(edge, edge_limit(np.sign(x)), dP)
+    return dP
+
 def associated_legendre(n,m, deriv=0):
     """associated legendre function of integer order and degree
 
@@ -28,6 +218,13 @@ def associated_legendre(n,m, deriv=0):
 
         returns lpmv(x) function     """
 
+    if np.abs(m) > n:
+        raise ValueError(f"abs(m) must be <= n (got n={n}, m={m})")
+
+    if deriv in (0,1):
+        return lambda x: _legendre_column(n, m, x, deriv=bool(deriv))
+
+    import sympy
     x = sympy.symbols('x')
     legfun_sym = sympy.functions.special.polynomials.assoc_legendre(n,m,x)
     legfunc_sym_deriv = sympy.diff(legfun_sym, x, deriv)
@@ -66,7 +263,7 @@ def tau_func(n, m):
 
     return f
 
-@lru_cache(maxsize=None)
+@lru_cache(maxsize=2**16)
 def a_func(m, n, u, v, p):
     """a function that appears in the VSH translation coefficients"""
 
@@ -83,7 +280,7 @@ def a_func(m, n, u, v, p):
 
     return factor*integral
 
-@lru_cache(maxsize=None)
+@lru_cache(maxsize=2**16)
 def b_func(m, n, u, v, p):
     """b function that appears in the VSH translation coefficients"""
 
@@ -94,6 +291,132 @@ def b_func(m, n, u, v, p):
 
     return b1*(b2+b3+b4)
 
+def wigner_3j_range(l1, l2, m1, m2):
+    """wigner 3j symbols (l1 l2 l3; m1 m2 m3) for every l3 at once, with m3 = -m1-m2,
+       computed with the Schulten-Gordon three-term recurrence in l3
+
+            l1, l2: int          orders
+            m1, m2: int,array    degrees (broadcast against each other)
+
+        returns w[l1+l2+1, ...], indexed by l3 (zero outside of the allowed range)    """
+
+    m1, m2 = np.broadcast_arrays(np.asarray(m1, dtype=float), np.asarray(m2, dtype=float))
+    m3 = -m1 - m2
+    lmax = l1 + l2
+    lmin = np.maximum(np.abs(l1-l2), np.abs(m3))
+    valid = (np.abs(m1) <= l1) & (np.abs(m2) <= l2) & (lmin <= lmax)
+    l = np.arange(lmax+3).reshape((-1,) + (1,)*m1.ndim)
+
+    A = np.sqrt(np.clip((l**2 - (l1-l2)**2)*((l1+l2+1)**2 - l**2)*(l**2 - m3**2), 0, None))
+    B = -(2*l+1)*(l1*(l1+1)*m3 - l2*(l2+1)*m3 - l*(l+1)*(m2-m1))
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # backward from lmax: stable where the solution grows toward lmin
+        wb = np.zeros((lmax+2,) + m1.shape)
+        wb[lmax] = 1
+        for j in range(lmax, 0, -1):
+            step = -(j*A[j+1]*wb[j+1] + B[j]*wb[j])/((j+1)*A[j])
+            wb[j-1] = np.where(j-1 >= lmin, step, 0)
+
+        # forward from lmin: stable where the solution grows toward lmax
+        wf = np.zeros((lmax+1,) + m1.shape)
+        wf[0] = np.where(lmin == 0, 1, 0)
+        if lmax >= 1:
+            seed = np.where(lmin == 0, m1/np.sqrt(l1*(l1+1)) if l1 > 0 else 0, 0)
+            wf[1] = np.where(lmin == 1, 1, seed)
+        for j in range(2, lmax+1):
+            step = -(B[j-1]*wf[j-1] + j*A[j-1]*wf[j-2])/((j-1)*A[j])
+            wf[j] = np.where(j == lmin, 1, np.where(j > lmin, step, 0))
+
+        # switch from forward to backward once the forward solution stops growing
+        l = l[:lmax+1]
+        stopped = (l >= lmin + 2) & (np.abs(wf) < np.abs(np.roll(wf, 2, axis=0)))
+        lmatch = np.where(np.any(stopped, axis=0), np.argmax(stopped, axis=0), lmax)
+        lmatch = np.where(lmax - lmin < 2, lmin, lmatch).astype(int)
+
+        f1 = np.take_along_axis(wf, np.maximum(lmatch-1, 0)[np.newaxis], axis=0)[0]
+        f2 = np.take_along_axis(wf, np.minimum(lmatch, lmax)[np.newaxis], axis=0)[0]
+        b1 = np.take_along_axis(wb, np.maximum(lmatch-1, 0)[np.newaxis], axis=0)[0]
+        b2 = np.take_along_axis(wb, np.minimum(lmatch, lmax)[np.newaxis], axis=0)[0]
+        scale = (f1*b1 + f2*b2)/(f1**2 + f2**2)
+
+        w = np.where(l < lmatch, scale*wf, wb[:lmax+1])
+        w = np.where(valid & (l >= lmin), w, 0)
+
+    norm = np.sqrt(np.sum((2*l+1)*w**2, axis=0))
+    norm = np.where(norm == 0, 1, norm)
+    return (-1.)**(l1-l2-m3)*w/norm
+
+def mode_index(n, m):
+    """index of the (n,m) VSH mode in packed arrays, ordered as n = 1,2,..., m = -n..n"""
+    return n*(n+1) + m - 1
+
+def _gaunt_block(n, v, size):
+    """a(m,n,u,v,p) for fixed n, v as an array [p,m+n,u+v], with p = 0..size-1"""
+    p = np.arange(n+v+1)[:,np.newaxis,np.newaxis]
+    m, u = np.meshgrid(np.arange(-n,n+1), np.arange(-v,v+1), indexing='ij')
+    w0 = wigner_3j_range(n, v, 0, 0)[:,np.newaxis,np.newaxis]
+    w = wigner_3j_range(n, v, m, u)
+
+    a_nv = np.zeros((size, 2*n+1, 2*v+1))
+    with np.errstate(invalid='ignore'):
+        log_factor = special.gammaln(n+m+1) + special.gammaln(v+u+1) + special.gammaln(p-m-u+1) \
+                   - special.gammaln(n-m+1) - special.gammaln(v-u+1) - special.gammaln(p+m+u+1)
+        a_nv[:n+v+1] = np.where(np.abs(m+u) <= p, (-1.)**(m+u)*(2*p+1)*np.exp(log_factor/2)*w0*w, 0)[:size]
+
+    return a_nv
+
+def _b_from_a(a_nv, n, v):
+    """b(m,n,u,v,p) for fixed n, v from a(m,n,-u-1,v,p-1), a(m,n,-u+1,v,p-1), a(m,n,-u,v,p-1),
+       both as arrays [p,m+n,u+v]"""
+    p = np.arange(len(a_nv))[:,np.newaxis,np.newaxis]
+    m, u = np.meshgrid(np.arange(-n,n+1), np.arange(-v,v+1), indexing='ij')
+
+    a_prev = np.zeros_like(a_nv)
+    a_prev[1:] = a_nv[:-1]
+    a_flip = np.pad(a_prev, ((0,0),(0,0),(1,1)))[...,::-1]
+    return (2*p+1)/(2*p-1)*((v-u)*(v+u+1)*a_flip[...,2:] - (p-m+u)*(p-m+u-1)*a_flip[...,:-2]
+                            + 2*u*(p-m+u)*a_flip[...,1:-1])
+
+def gaunt_tables(nmax, layout='dense'):
+    """a and b functions that appear in the VSH translation coefficients for all
+       indices up to nmax, from the closed form in terms of wigner 3j symbols
+
+            nmax: int       maximum order n, v (p runs from 0 to 2*nmax)
+            layout: str     'dense' or 'packed'
+
+        returns (a, b); for the dense layout a[m,n,u,v,p] == a_func(m,n,u,v,p) with negative
+        m, u wrapping around; for the packed layout a[mode_index(n,m), mode_index(v,u), p]   """
+
+    if layout not in ('dense', 'packed'):
+        raise ValueError(f"layout must be 'dense' or 'packed' (got '{layout}')")
+
+    size = 2*nmax + 1
+    if layout == 'dense':
+        a = np.zeros((size, nmax+1, size, nmax+1, size))
+    else:
+        nmodes = nmax*(nmax+2)
+        a = np.zeros((nmodes, nmodes, size))
+    b = np.zeros_like(a)
+
+    p = np.arange(size)[:,np.newaxis,np.newaxis]
+    for n in range(nmax+1):
+        for v in range(nmax+1):
+            m, u = np.meshgrid(np.arange(-n,n+1), np.arange(-v,v+1), indexing='ij')
+            a_nv = _gaunt_block(n, v, size)
+            b_nv = _b_from_a(a_nv, n, v)
+
+            if layout == 'dense':
+                m_idx, u_idx = m[...,np.newaxis], u[...,np.newaxis]
+                a[m_idx, n, u_idx, v, p.T] = np.moveaxis(a_nv, 0, -1)
+                b[m_idx, n, u_idx, v, p.T] = np.moveaxis(b_nv, 0, -1)
+            elif n > 0 and v > 0:
+                i, j = mode_index(n, m), mode_index(v, u)
+                a[i,j] = np.moveaxis(a_nv, 0, -1)
+                b[i,j] = np.moveaxis(b_nv, 0, -1)
+
+    return a, b
+
 def Emn(m, n, E0):
     return E0*1j**n*(2*n+1)*factorial(n-m)/factorial(n+m)
 
@@ -122,9 +445,68 @@ def B_translation(m, n, u, v, r, theta, phi, k):
         else:
             Pnm = associated_legendre(p,m-u)
             sum_term += (-1j)**p *b_func(m,n,u,v,p)*spherical_hn(p, k*r)*Pnm(np.cos(theta))*np.exp(1j*(m-u)*phi)
-    
+
     return normalization*factor*sum_term
 
+def translation_matrices(displacements, k, lmax, store=None):
+    """A and B VSH translation coefficients between every pair of modes up to lmax,
+       for many displacement vectors at once
+
+            displacements[K,3]   cartesian displacement vectors
+            k                    wavenumber
+            lmax: int            maximum order
+            store                coefficient_store to read a, b from (default: compute with gaunt_tables)
+
+       returns (A[K,Nmodes,Nmodes], B[K,Nmodes,Nmodes]), where
+       A[:,mode_index(n,m),mode_index(v,u)] == A_translation(m,n,u,v,r,theta,phi,k)     """
+
+    displacements = np.atleast_2d(displacements)
+    x, y, z = displacements.T
+    r = np.sqrt(x**2 + y**2 + z**2)
+    theta = np.arccos(z/r)
+    phi = np.arctan2(y, x)
+
+    # mode pairs (n,m) x (v,u)
+    n = np.concatenate([np.full(2*j+1, j) for j in range(1, lmax+1)])
+    m = np.concatenate([np.arange(-j, j+1) for j in range(1, lmax+1)])
+    n, v = np.meshgrid(n, n, indexing='ij')
+    m, u = np.meshgrid(m, m, indexing='ij')
+
+    factor = (-1.)**u*1.j**(v-n)*(2*v+1)/(2*v*(v+1))
+    normalization = 1.j**(v-n)*(2*v+1)/(2*n+1)*np.exp(special.gammaln(v-u+1) - special.gammaln(v+u+1)
+                                                       - special.gammaln(n-m+1) + special.gammaln(n+m+1))
+    prefactor = normalization*factor
+
+    # a(m,n,-u,v,p) for A and b(m,n,u,v,p) for B
+    pmax = 2*lmax
+    p = np.arange(pmax+1)
+    if store is None:
+        a, b = gaunt_tables(lmax, layout='packed')
+    else:
+        a, b = store.tables(lmax)
+    a = a[:,mode_index(v[0],-u[0])]
+    n_p, v_p = n[...,np.newaxis], v[...,np.newaxis]
+    in_range = (p >= np.abs(n_p-v_p)) & (p <= n_p+v_p)
+    coeff_A = np.where(in_range, (-1j)**p*(n_p*(n_p+1) + v_p*(v_p+1) - p*(p+1))*a, 0)
+    coeff_B = np.where(in_range, (-1j)**p*b, 0)
+
+    # radial and angular factors shared by every mode pair: Z[p,q] = h_p(kr) P_p^q(cos(theta)) exp(iq phi)
+    q = np.arange(2*pmax+1)
+    q = np.where(q <= pmax, q, q - (2*pmax+1))
+    hn = spherical_bessel_table(pmax, k*r)[2]
+    Z = hn[:,np.newaxis]*associated_legendre_table(pmax, np.cos(theta))*np.exp(1j*q[:,np.newaxis]*phi)
+
+    A = np.zeros(n.shape + r.shape, dtype=complex)
+    B = np.zeros_like(A)
+    for j in range(pmax+1):
+        Zj = Z[j,m-u]
+        A += coeff_A[...,j,np.newaxis]*Zj
+        B += coeff_B[...,j,np.newaxis]*Zj
+
+    A = np.moveaxis(prefactor[...,np.newaxis]*A, -1, 0)
+    B = np.moveaxis(prefactor[...,np.newaxis]*B, -1, 0)
+    return A, B
+
 class VSH_mode(enum.Enum):
     outgoing = enum.auto()
     ingoing  = enum.auto()
@@ -176,6 +558,80 @@ def VSH(n, m, mode=VSH_mode.outgoing):
 
     return N,M
 
+def VSH_expansion(p, q, r, theta, phi, k, mode=VSH_mode.outgoing):
+    """field of a VSH expansion, sum over n,m of p_nm N_nm + q_nm M_nm, evaluating every
+       radial order, azimuthal order and the legendre table only once
+
+            p[Nmodes]        N expansion coefficients, indexed by mode_index(n,m) (or None)
+            q[Nmodes]        M expansion coefficients, indexed by mode_index(n,m) (or None)
+            r,theta,phi,k    arrays (broadcast against each other); theta may be a spherical_grid (phi = None),
+                             evaluated on its [N1,N2] mesh with its cached Legendre table
+            mode: VSH_mode   type of VSH (outgoing, incident)
+
+       returns the field [3,...], the 3 r,θ,ϕ components                               """
+
+    # position of z_n in the output of spherical_bessel_table (z_n' is 3 further)
+    if mode is VSH_mode.outgoing:
+        zn = 2
+    elif mode is VSH_mode.incident:
+        zn = 0
+    else:
+        raise TypeError('mode must be of enum type VSH_mode')
+
+    nmodes = len(p) if p is not None else len(q)
+    lmax = int(np.sqrt(nmodes + 1)) - 1
+    if lmax*(lmax+2) != nmodes:
+        raise ValueError(f'number of coefficients ({nmodes}) does not correspond to a complete set of modes')
+
+    grid = theta if isinstance(theta, spherical_grid) else None
+    if grid is not None:
+        theta, phi = grid.sparse_mesh
+
+    # pad every input to the broadcast ndim, so that the leading (m) axis of the tables lines up
+    r, theta, phi, k = map(np.asarray, (r, theta, phi, k))
+    ndim = len(np.broadcast_shapes(r.shape, theta.shape, phi.shape, k.shape))
+    r, theta, phi, k = (x.reshape((1,)*(ndim - x.ndim) + x.shape) for x in (r, theta, phi, k))
+    kr = k*r
+    extra_dims = (1,)*ndim
+
+    # radial orders, azimuthal orders and legendre table, each computed once
+    bessel = spherical_bessel_table(lmax, kr)
+    H, Hp = bessel[zn], bessel[zn+3]
+    m_all = np.arange(2*lmax+1)
+    m_all = np.where(m_all <= lmax, m_all, m_all - (2*lmax+1)).reshape((-1,) + (1,)*phi.ndim)
+    exp_phi = np.exp(1j*m_all*phi)
+    if grid is not None:
+        P, dP = (table.reshape(table.shape[:2] + theta.shape) for table in grid.legendre(lmax, deriv=True))
+        sin_theta = grid.sin_theta.reshape(theta.shape)
+    else:
+        P, dP = associated_legendre_table(lmax, np.cos(theta), deriv=True)
+        sin_theta = np.sin(theta)
+
+    field = 0
+    for n in range(1, lmax+1):
+        m = np.arange(-n, n+1)
+        Pn = P[n,m]
+        exp_n = exp_phi[m]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pi_n = m.reshape((-1,) + (1,)*theta.ndim)*Pn/sin_theta
+            tau_n = -sin_theta*dP[n,m]
+
+        if p is not None:
+            pn = np.asarray(p)[mode_index(n,m)].reshape((-1,) + extra_dims)
+            factor = (H[n] + kr*Hp[n])/kr
+            r_comp = n*(n+1)*H[n]/kr*np.sum(pn*Pn*exp_n, axis=0)
+            theta_comp = factor*np.sum(pn*tau_n*exp_n, axis=0)
+            phi_comp = factor*np.sum(1j*pn*pi_n*exp_n, axis=0)
+            field = field + np.array([r_comp, theta_comp, phi_comp])
+
+        if q is not None:
+            qn = np.asarray(q)[mode_index(n,m)].reshape((-1,) + extra_dims)
+            theta_comp = H[n]*np.sum(1j*qn*pi_n*exp_n, axis=0)
+            phi_comp = -H[n]*np.sum(qn*tau_n*exp_n, axis=0)
+            field = field + np.array([np.zeros_like(theta_comp), theta_comp, phi_comp])
+
+    return field
+
 
 ##### riccati needs to be verified with miepy #####
 
@@ -188,7 +644,7 @@ def riccati_1(n,z, derivative = False):
     return z*jn
 
 def riccati_2(n,z, derivative = False):
-    yn = special.spherical_yn(n, z, derivative = derivative) 
+    yn = special.spherical_yn(n, z)
 
     if derivative:
         yn_p = special.spherical_yn(n, z, derivative=True)
@@ -198,77 +654,257 @@ def riccati_2(n,z, derivative = False):
 def riccati_3(n,z, derivative = False):
     return riccati_2(n,z, derivative) - riccati_1(n,z, derivative)
 
+def riccati_table(nmax, z, log_derivative=False):
+    """riccati-bessel functions psi_n = z j_n, chi_n = -z y_n, xi_n = z h_n = psi_n - i chi_n
+       and their derivatives for all orders 0..nmax
+
+            nmax: int                maximum order
+            z: array[complex/float]  argument (any shape), e.g. size parameters of a wavelength sweep
+            log_derivative: bool     If True, return the logarithmic derivatives instead: psi_n'/psi_n
+                                     from downward recurrence (continued fraction) and xi_n'/xi_n from
+                                     upward recurrence, which do not overflow at high order
+
+       returns (psi, chi, xi, psi_p, chi_p, xi_p), each [nmax+1, ...]
+               or (D1, D3) = (psi'/psi, xi'/xi), each [nmax+1, ...], if log_derivative is True    """
+
+    z = np.asarray(z)
+
+    if not log_derivative:
+        jn, yn, hn, jn_p, yn_p, hn_p = spherical_bessel_table(nmax, z)
+        return z*jn, -z*yn, z*hn, jn + z*jn_p, -yn - z*yn_p, hn + z*hn_p
+
+    shape = z.shape
+    z = z.ravel().astype(complex)
+    n = np.arange(nmax+1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # D1_{n-1} = n/z - 1/(D1_n + n/z), downward from an order well above max(nmax, |z|)
+        zmax = np.max(np.abs(z)) if len(z) else 0
+        start = int(max(nmax, zmax) + 20 + 4*zmax**(1/3))
+        D1 = np.zeros((nmax+1, len(z)), dtype=complex)
+        D = np.zeros(len(z), dtype=complex)
+        for j in range(start, 0, -1):
+            D = j/z - 1/(D + j/z)
+            if j-1 <= nmax:
+                D1[j-1] = D
+
+        # D3_n = -n/z + 1/(n/z - D3_{n-1}), upward from D3_0 = i
+        D3 = np.zeros((nmax+1, len(z)), dtype=complex)
+        D3[0] = 1j
+        for j in n[1:]:
+            D3[j] = -j/z + 1/(j/z - D3[j-1])
+
+    return D1.reshape((nmax+1,) + shape), D3.reshape((nmax+1,) + shape)
+
 ###### below are pi,tau,VSH used in Mie theory, which may differ from those defined above ######
 
-def pi_tau_func(n):
-    # if np.sin(theta) == 0: return 0
-    lpn = special.legendre(n)
-    lpn_p = lpn.deriv()
-    lpn_p2 = lpn_p.deriv()
+def pi_tau_table(nmax, theta):
+    """pi and tau functions (as in pi_tau_func) for all orders 1..nmax at once,
+       from the standard upward recurrences
+
+            nmax: int       maximum order
+            theta: array    polar angle (any shape)
+
+       returns (pi[nmax,...], tau[nmax,...]), where index n-1 holds order n       """
+
+    theta = np.asarray(theta)
+    mu = np.cos(theta)
+    pi = np.zeros((nmax+1,) + theta.shape)
+    if nmax >= 1:
+        pi[1] = 1
+    for n in range(2, nmax+1):
+        pi[n] = (2*n-1)/(n-1)*mu*pi[n-1] - n/(n-1)*pi[n-2]
 
+    n = np.arange(1, nmax+1).reshape((-1,) + (1,)*theta.ndim)
+    tau = n*mu*pi[1:] - (n+1)*pi[:-1]
+
+    # pi_n = -dP_n/dmu, tau_n = d/dtheta(-sin(theta) dP_n/dmu)
+    return -pi[1:], -tau
+
+def pi_tau_func(n):
     def pi_func(theta):
-        return -1*lpn_p(np.cos(theta))
-        # with np.errstate(divide='ignore', invalid='ignore'):
-            # val = lpn(np.cos(theta))/np.sin(theta)
-            # val[val == np.inf] = 0
-            # val = np.nan_to_num(val)
-            # return val
+        return pi_tau_table(n, theta)[0][n-1]
 
     def tau_func(theta):
-        # val = -1*np.sin(theta)*lpn_p(np.cos(theta))
-        val = -1*np.cos(theta)*lpn_p(np.cos(theta)) + np.sin(theta)**2*lpn_p2(np.cos(theta))
-        return val
+        return pi_tau_table(n, theta)[1][n-1]
 
     return pi_func, tau_func 
 
 class vector_spherical_harmonics:
-    def __init__(self, n, superscript=3):
-        self.pi_func, self.tau_func = pi_tau_func(n)
+    def __init__(self, n, superscript=3, all_orders=False):
+        """vector spherical harmonics used in Mie theory
+
+                n               order (the maximum order if all_orders is True)
+                superscript     radial dependence, 1 (j_n) or 3 (h_n)
+                all_orders      If True, evaluate every order 1..n together; each component
+                                is then an [n,...] array                                    """
         self.n = n
+        self.all_orders = all_orders
 
+        # position of z_n in the output of spherical_bessel_table (z_n' is 3 further)
         if superscript == 1:
-            self.z_func = lambda x: special.spherical_jn(n,x)
-            self.zp_func = lambda x: special.spherical_jn(n,x, derivative=True)
+            self.zn = 0
         elif superscript == 3:
-            self.z_func = lambda x: spherical_hn(n,x)
-            self.zp_func = lambda x: spherical_hn(n,x, derivative=True)
+            self.zn = 2
+        else:
+            raise ValueError(f'superscript must be 1 or 3 (got {superscript})')
+
+    def pi_func(self, theta):
+        return self._angular(theta)[0]
+
+    def tau_func(self, theta):
+        return self._angular(theta)[1]
+
+    def z_func(self, x):
+        return self._radial(x)[0]
+
+    def zp_func(self, x):
+        return self._radial(x)[1]
 
     def M_o1n(self, k):
         def f(r, theta, phi):
-            theta_comp = np.cos(phi)*self.pi_func(theta)*self.z_func(k*r)
-            phi_comp = -1*np.sin(phi)*self.tau_func(theta)*self.z_func(k*r)
-            r_comp = np.zeros(shape = theta.shape, dtype=np.complex)
+            p, theta, phi, pi, tau, z, zp = self._terms(k, r, theta, phi)
+            theta_comp = np.cos(phi)*pi*z
+            phi_comp = -1*np.sin(phi)*tau*z
+            r_comp = np.zeros_like(theta_comp)
             return np.array([r_comp, theta_comp, phi_comp])
         return f
 
     def M_e1n(self, k):
         def f(r, theta, phi):
-            theta_comp = -1*np.sin(phi)*self.pi_func(theta)*self.z_func(k*r)
-            phi_comp = -1*np.cos(phi)*self.tau_func(theta)*self.z_func(k*r)
-            r_comp = np.zeros(shape = theta.shape, dtype=np.complex)
+            p, theta, phi, pi, tau, z, zp = self._terms(k, r, theta, phi)
+            theta_comp = -1*np.sin(phi)*pi*z
+            phi_comp = -1*np.cos(phi)*tau*z
+            r_comp = np.zeros_like(theta_comp)
             return np.array([r_comp, theta_comp, phi_comp])
         return f
 
     def N_o1n(self, k):
         def f(r, theta, phi):
-            p = k*r
-            theta_comp = np.sin(phi)*self.tau_func(theta)*(self.z_func(p) + p*self.zp_func(p))/p
-            phi_comp = np.cos(phi)*self.pi_func(theta)*(self.z_func(p) + p*self.zp_func(p))/p
-            r_comp = np.sin(phi)*self.n*(self.n+1)*np.sin(theta)*self.pi_func(theta)*self.z_func(p)/p
+            p, theta, phi, pi, tau, z, zp = self._terms(k, r, theta, phi)
+            theta_comp = np.sin(phi)*tau*(z + p*zp)/p
+            phi_comp = np.cos(phi)*pi*(z + p*zp)/p
+            r_comp = np.sin(phi)*self._order_factor(p)*np.sin(theta)*pi*z/p
             return np.array([r_comp, theta_comp, phi_comp])
         return f
 
     def N_e1n(self, k):
         def f(r, theta, phi):
-            p = k*r
-            theta_comp = np.cos(phi)*self.tau_func(theta)*(self.z_func(p) + p*self.zp_func(p))/p
-            phi_comp = -1*np.sin(phi)*self.pi_func(theta)*(self.z_func(p) + p*self.zp_func(p))/p
-            r_comp = np.cos(phi)*self.n*(self.n+1)*np.sin(theta)*self.pi_func(theta)*self.z_func(p)/p
+            p, theta, phi, pi, tau, z, zp = self._terms(k, r, theta, phi)
+            theta_comp = np.cos(phi)*tau*(z + p*zp)/p
+            phi_comp = -1*np.sin(phi)*pi*(z + p*zp)/p
+            r_comp = np.cos(phi)*self._order_factor(p)*np.sin(theta)*pi*z/p
             return np.array([r_comp, theta_comp, phi_comp])
         return f
 
+    def _terms(self, k, r, theta, phi):
+        """k*r, theta and phi broadcast to one shape, and pi, tau, z_n, z_n' on that shape
+           (each with a leading order axis if all_orders)"""
+        p, theta, phi = np.broadcast_arrays(k*np.asarray(r), theta, phi)
+        pi, tau = self._angular(theta)
+        z, zp = self._radial(p)
+        return p, theta, phi, pi, tau, z, zp
+
+    def _angular(self, theta):
+        """pi and tau at theta, for order n or all orders up to n"""
+        pi, tau = pi_tau_table(self.n, theta)
+        if self.all_orders:
+            return pi, tau
+        return pi[-1], tau[-1]
+
+    def _radial(self, x):
+        """z_n(x) and z_n'(x), for order n or all orders up to n"""
+        bessel = spherical_bessel_table(self.n, x)
+        z, zp = bessel[self.zn][1:], bessel[self.zn+3][1:]
+        if self.all_orders:
+            return z, zp
+        return z[-1], zp[-1]
+
+    def _order_factor(self, p):
+        """n(n+1), shaped to broadcast against p (the broadcast k*r) if all_orders"""
+        if not self.all_orders:
+            return self.n*(self.n+1)
+        n = np.arange(1, self.n+1).reshape((-1,) + (1,)*np.ndim(p))
+        return n*(n+1)
+
 if __name__ == "__main__":
-    import matplotlib.pyplot as plt
+    # test and time the single-column associated_legendre against associated_legendre_table
+    import time
+    x = np.linspace(-1, 1, 41)
+    P, dP = associated_legendre_table(12, x, deriv=True)
+    for n in range(13):
+        for m in range(-n, n+1):
+            scale, dscale = np.max(np.abs(P[n,m])), np.nanmax(np.abs(dP[n,m]))
+            assert np.allclose(associated_legendre(n,m)(x), P[n,m], rtol=0, atol=1e-12*scale)
+            assert np.allclose(associated_legendre(n,m,1)(x), dP[n,m], rtol=0, atol=1e-12*dscale, equal_nan=True)
+            assert np.isclose(associated_legendre(n,m)(x[7]), P[n,m,7], rtol=0, atol=1e-12*scale)
+
+    Pnm = associated_legendre(20, 3)
+    start = time.perf_counter()
+    for i in range(1000):
+        Pnm(0.3)
+    column_time = (time.perf_counter() - start)/1000
+    start = time.perf_counter()
+    for i in range(100):
+        associated_legendre_table(20, 0.3)[20,3]
+    table_time = (time.perf_counter() - start)/100
+    print(f"P_20^3(0.3): {column_time*1e6:.1f} us per call (full table: {table_time*1e6:.1f} us)")
+    assert column_time < table_time
+
+    # test gaunt_tables against the quadrature-based a_func, b_func
+    nmax = 4
+    a, b = gaunt_tables(nmax)
+    err_a = err_b = 0
+    for n in range(nmax+1):
+        for v in range(nmax+1):
+            for m in range(-n, n+1):
+                for u in range(-v, v+1):
+                    for p in range(n+v+1):
+                        err_a = max(err_a, abs(a[m,n,u,v,p] - a_func(m,n,u,v,p)))
+                        err_b = max(err_b, abs(b[m,n,u,v,p] - b_func(m,n,u,v,p)))
+    print("gaunt_tables max error (a, b): ", err_a, err_b)
+    assert err_a < 1e-8 and err_b < 1e-8
+
+    # test VSH_expansion on mixed-shape inputs against the sum of per-order VSH closures
+    lmax = 3
+    rng = np.random.default_rng(0)
+    p_nm, q_nm = rng.normal(size=(2, lmax*(lmax+2))) + 1j*rng.normal(size=(2, lmax*(lmax+2)))
+    inputs = [(2.0, np.linspace(0.1, 3, 5), 0.3, 1.5),
+              (2.0, 0.7, 0.3, np.linspace(1, 2, 4)),
+              (np.linspace(1, 2, 3)[:,np.newaxis,np.newaxis], np.linspace(0.1, 3, 5)[:,np.newaxis],
+               np.linspace(0, 6, 4), np.array([1.5, 2.5])[:,np.newaxis,np.newaxis,np.newaxis])]
+    for r, theta, phi, k in inputs:
+        expected = 0
+        for n in range(1, lmax+1):
+            for m in range(-n, n+1):
+                N, M = VSH(n, m)
+                expected = expected + p_nm[mode_index(n,m)]*N(r, theta, phi, k) + q_nm[mode_index(n,m)]*M(r, theta, phi, k)
+        field = VSH_expansion(p_nm, q_nm, r, theta, phi, k)
+        assert field.shape == expected.shape and np.allclose(field, expected)
+
+    grid = spherical_grid(np.linspace(0.1, 3, 5), np.linspace(0, 6, 4))
+    r = np.linspace(1, 2, 3)[:,np.newaxis,np.newaxis]
+    expected = VSH_expansion(p_nm, q_nm, r, *grid.sparse_mesh, 1.5)
+    assert np.allclose(VSH_expansion(p_nm, q_nm, r, grid, None, 1.5), expected)
+    print("VSH_expansion matches the per-order VSH sum on mixed-shape inputs")
+
+    # test the all_orders Mie VSH against each single order, on inputs of different shapes
+    nmax = 5
+    for r, theta, phi in [(2.0, np.linspace(0.1, 3, 4), 0.3), (2.0, np.linspace(0.1, 3, nmax), 0.3),
+                          (np.linspace(1, 2, 3)[:,np.newaxis], np.linspace(0.1, 3, 4), np.linspace(0, 6, 4))]:
+        for name in ('M_o1n', 'M_e1n', 'N_o1n', 'N_e1n'):
+            field = getattr(vector_spherical_harmonics(nmax, all_orders=True), name)(1.5)(r, theta, phi)
+            for n in range(1, nmax+1):
+                expected = getattr(vector_spherical_harmonics(n), name)(1.5)(r, theta, phi)
+                assert np.allclose(field[:,n-1], expected)
+    print("all_orders vector_spherical_harmonics match each single order")
+
+    # plots (skipped if matplotlib is not installed, e.g. on a headless machine)
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib not installed, plots skipped")
+        raise SystemExit
 
     plt.figure(1)
 
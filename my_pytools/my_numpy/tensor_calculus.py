@@ -0,0 +1,193 @@
+"""
+Batched vector calculus (gradient, divergence, curl) on Cartesian and spherical grids,
+with finite-difference weights computed once per axis
+"""
+
+import numpy as np
+from .indices import levi_civita
+from .grids import spherical_grid
+
+class fd_derivative:
+    def __init__(self, x, period=None):
+        """first derivative along one axis with second order finite differences (the stencils of
+           np.gradient with edge_order=2), with the weights computed once
+
+                x[N]        axis values (uniform or non-uniform, N >= 3)
+                period      (optional) period of the axis (e.g. 2*pi for phi); the axis is periodic if it spans
+                            a full period, either with its endpoint (x[-1] = x[0] + period) or without it   """
+        x = np.asarray(x, dtype=float)
+        if len(x) < 3:
+            raise ValueError(f"finite differences need at least 3 points (got {len(x)})")
+
+        self.endpoint = period is not None and np.isclose(x[-1] - x[0], period)
+        self.periodic = self.endpoint or (period is not None and np.isclose(x[-1] - x[0] + (x[1] - x[0]), period))
+        self.N = len(x)
+
+        # unique points, extended by one on each side (wrapped around if periodic)
+        n = self.N - 1 if self.endpoint else self.N
+        if self.periodic:
+            x = np.concatenate([[x[n-1] - period], x[:n], [x[0] + period]])
+        else:
+            x = np.concatenate([[np.nan], x, [np.nan]])
+
+        hs = x[1:-1] - x[:-2]
+        hd = x[2:] - x[1:-1]
+        self.weights = np.array([-hd/(hs*(hd + hs)), (hd - hs)/(hd*hs), hs/(hd*(hd + hs))])
+
+        if not self.periodic:
+            h1, h2 = x[2] - x[1], x[3] - x[2]
+            self.first = np.array([-(2*h1 + h2)/(h1*(h1 + h2)), (h1 + h2)/(h1*h2), -h1/(h2*(h1 + h2))])
+            h1, h2 = x[-3] - x[-4], x[-2] - x[-3]
+            self.last = np.array([h2/(h1*(h1 + h2)), -(h1 + h2)/(h1*h2), (2*h2 + h1)/(h2*(h1 + h2))])
+
+    def __call__(self, f, axis=-1, out=None):
+        """derivative of f along axis (optionally into out)"""
+        f = np.asarray(f)
+        if f.shape[axis] != self.N:
+            raise ValueError(f"axis {axis} of f has length {f.shape[axis]}, not {self.N}")
+        if out is None:
+            out = np.empty(f.shape, dtype=np.result_type(f, float))
+
+        f = np.moveaxis(f, axis, -1)
+        o = np.moveaxis(out, axis, -1)
+        n = self.N - 1 if self.endpoint else self.N
+        w0, w1, w2 = self.weights
+
+        # interior: three passes
+        np.multiply(f[...,:n-2], w0[1:-1], out=o[...,1:n-1])
+        o[...,1:n-1] += w1[1:-1]*f[...,1:n-1]
+        o[...,1:n-1] += w2[1:-1]*f[...,2:n]
+
+        if self.periodic:
+            o[...,0] = w0[0]*f[...,n-1] + w1[0]*f[...,0] + w2[0]*f[...,1]
+            o[...,n-1] = w0[-1]*f[...,n-2] + w1[-1]*f[...,n-1] + w2[-1]*f[...,0]
+            if self.endpoint:
+                o[...,n] = o[...,0]
+        else:
+            o[...,0] = self.first[0]*f[...,0] + self.first[1]*f[...,1] + self.first[2]*f[...,2]
+            o[...,-1] = self.last[0]*f[...,-3] + self.last[1]*f[...,-2] + self.last[2]*f[...,-1]
+
+        return out
+
+class cartesian_operators:
+    def __init__(self, x, y, z):
+        """gradient, divergence and curl on a Cartesian grid, for fields with any number of leading
+           (batch) dimensions: scalars f[...,Nx,Ny,Nz] and vectors F[...,3,Nx,Ny,Nz]
+
+                x[Nx], y[Ny], z[Nz]     grid axes (uniform or non-uniform)    """
+        self.derivatives = [fd_derivative(x), fd_derivative(y), fd_derivative(z)]
+        self.shape = (len(x), len(y), len(z))
+
+    def gradient(self, f, out=None):
+        """gradient of the scalar field f[...,Nx,Ny,Nz], returns [...,3,Nx,Ny,Nz]"""
+        f = np.asarray(f)
+        if out is None:
+            out = np.empty(f.shape[:-3] + (3,) + self.shape, dtype=np.result_type(f, float))
+        for i, d in enumerate(self.derivatives):
+            d(f, axis=i-3, out=out[...,i,:,:,:])
+        return out
+
+    def divergence(self, F, out=None):
+        """divergence of the vector field F[...,3,Nx,Ny,Nz], returns [...,Nx,Ny,Nz]"""
+        F = np.asarray(F)
+        out = self.derivatives[0](F[...,0,:,:,:], axis=-3, out=out)
+        buffer = np.empty_like(out)
+        for i in (1, 2):
+            out += self.derivatives[i](F[...,i,:,:,:], axis=i-3, out=buffer)
+        return out
+
+    def curl(self, F, out=None):
+        """curl of the vector field F[...,3,Nx,Ny,Nz], curl_i = eps_ijk d_j F_k, returns [...,3,Nx,Ny,Nz]"""
+        F = np.asarray(F)
+        if out is None:
+            out = np.empty(F.shape, dtype=np.result_type(F, float))
+        buffer = np.empty(out.shape[:-4] + self.shape, dtype=out.dtype)
+
+        # each component is one derivative written in place, minus one more (the nonzero eps_ijk)
+        eps = levi_civita()
+        for i, j, k in zip(*np.nonzero(eps > 0)):
+            self.derivatives[j](F[...,k,:,:,:], axis=j-3, out=out[...,i,:,:,:])
+            out[...,i,:,:,:] -= self.derivatives[k](F[...,j,:,:,:], axis=k-3, out=buffer)
+        return out
+
+class spherical_operators:
+    def __init__(self, r, theta=None, phi=None):
+        """gradient, divergence and curl on a spherical grid, for fields with any number of leading
+           (batch) dimensions: scalars f[...,Nr,Ntheta,Nphi] and vectors F[...,3,Nr,Ntheta,Nphi] in
+           (r, theta, phi) components. phi is treated as periodic if it spans 2*pi. Values at r = 0
+           and at the poles involve 1/r and 1/sin(theta) and are not finite
+
+                r[Nr]               values of r (or a spherical_grid with r)
+                theta[Ntheta]       values of theta
+                phi[Nphi]           values of phi                               """
+        if isinstance(r, spherical_grid):
+            r, theta, phi = r.r, r.theta, r.phi
+
+        r, theta, phi = (np.asarray(x, dtype=float) for x in (r, theta, phi))
+        self.shape = (len(r), len(theta), len(phi))
+        self.derivatives = [fd_derivative(r), fd_derivative(theta), fd_derivative(phi, period=2*np.pi)]
+
+        # broadcastable geometric factors
+        self.r = r[:,np.newaxis,np.newaxis]
+        self.sin_theta = np.sin(theta)[:,np.newaxis]
+        with np.errstate(divide='ignore'):
+            self.inv_r = 1/self.r
+            self.inv_sin = 1/self.sin_theta
+            self.inv_r_sin = self.inv_r*self.inv_sin
+
+    def _d(self, i, f, out=None):
+        return self.derivatives[i](f, axis=i-3, out=out)
+
+    def gradient(self, f, out=None):
+        """gradient of the scalar field f[...,Nr,Ntheta,Nphi], returns [...,3,Nr,Ntheta,Nphi]"""
+        f = np.asarray(f)
+        if out is None:
+            out = np.empty(f.shape[:-3] + (3,) + self.shape, dtype=np.result_type(f, float))
+
+        with np.errstate(invalid='ignore'):
+            self._d(0, f, out=out[...,0,:,:,:])
+            self._d(1, f, out=out[...,1,:,:,:])
+            out[...,1,:,:,:] *= self.inv_r
+            self._d(2, f, out=out[...,2,:,:,:])
+            out[...,2,:,:,:] *= self.inv_r_sin
+        return out
+
+    def divergence(self, F, out=None):
+        """divergence of the vector field F[...,3,Nr,Ntheta,Nphi], returns [...,Nr,Ntheta,Nphi]"""
+        F = np.asarray(F)
+        Fr, Ft, Fp = F[...,0,:,:,:], F[...,1,:,:,:], F[...,2,:,:,:]
+
+        with np.errstate(invalid='ignore'):
+            out = self._d(0, self.r**2*Fr, out=out)
+            out *= self.inv_r**2
+            angular = self._d(1, self.sin_theta*Ft)
+            angular += self._d(2, Fp)
+            angular *= self.inv_r_sin
+            out += angular
+        return out
+
+    def curl(self, F, out=None):
+        """curl of the vector field F[...,3,Nr,Ntheta,Nphi], returns [...,3,Nr,Ntheta,Nphi]"""
+        F = np.asarray(F)
+        if out is None:
+            out = np.empty(F.shape, dtype=np.result_type(F, float))
+        Fr, Ft, Fp = F[...,0,:,:,:], F[...,1,:,:,:], F[...,2,:,:,:]
+        buffer = np.empty(out.shape[:-4] + self.shape, dtype=out.dtype)
+
+        with np.errstate(invalid='ignore'):
+            # r: (d_theta(sin Fphi) - d_phi Ftheta)/(r sin)
+            self._d(1, self.sin_theta*Fp, out=out[...,0,:,:,:])
+            out[...,0,:,:,:] -= self._d(2, Ft, out=buffer)
+            out[...,0,:,:,:] *= self.inv_r_sin
+
+            # theta: d_phi Fr/(r sin) - d_r(r Fphi)/r
+            self._d(2, Fr, out=out[...,1,:,:,:])
+            out[...,1,:,:,:] *= self.inv_sin
+            out[...,1,:,:,:] -= self._d(0, self.r*Fp, out=buffer)
+            out[...,1,:,:,:] *= self.inv_r
+
+            # phi: (d_r(r Ftheta) - d_theta Fr)/r
+            self._d(0, self.r*Ft, out=out[...,2,:,:,:])
+            out[...,2,:,:,:] -= self._d(1, Fr, out=buffer)
+            out[...,2,:,:,:] *= self.inv_r
+        return out
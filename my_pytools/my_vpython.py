@@ -1,7 +1,5 @@
 import numpy as np
-import matplotlib as mpl
 from itertools import cycle
-import quaternion
 
 def trajectory_animation_3d(coordinates, orientations, shape, properties, colors=['C0'], trail=None, axes=False, axes_length=1, grid=False):
     """Create a 3D trajectory animation with VPython
@@ -18,6 +16,8 @@ def trajectory_animation_3d(coordinates, orientations, shape, properties, colors
     """
 
     import vpython
+    import quaternion
+    import matplotlib as mpl
     vec = vpython.vector
 
     coordinates = np.asarray(coordinates)
@@ -108,6 +108,7 @@ def trajectory_animation_3d(coordinates, orientations, shape, properties, colors
 
 if __name__ == '__main__':
     import vpython
+    import quaternion
 
     coordinates = np.zeros([100, 2, 3])
     orientations = np.ones([100,2], dtype=np.quaternion)